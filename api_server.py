@@ -1,6 +1,15 @@
 import os
 import json
-from flask import Flask, jsonify, request, render_template, Blueprint
+import html
+import math
+import zlib
+import base64
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import Flask, jsonify, request, render_template, Blueprint, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 
@@ -9,28 +18,54 @@ TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 
 app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
-CORS(app)
+CORS(app, expose_headers=['X-Notes-Revision'])
 socketio = SocketIO(app, cors_allowed_origins='*')
 
 NODE_MODULES_DIR = os.path.join(BASE_DIR, 'node_modules')
 node_modules_bp = Blueprint('node_modules', __name__, static_folder=NODE_MODULES_DIR)
 app.register_blueprint(node_modules_bp, url_prefix='/node_modules')
 
-from app.config import SETTINGS_FILE
+from app.config import TELEGRAM_WEBHOOK_PATH
 from app.core.database import (
     get_all_local_notes,
-    init_local_db,
+    get_local_notes_by_ids,
+    query_local_notes,
+    create_local_note,
+    get_outbox_stats,
+    get_failed_outbox,
+    bulk_create_local_notes,
+    bulk_update_note_status,
+    bulk_delete_notes,
+    update_local_note_fields,
+    add_notes_listener,
     update_note_status,
     delete_note_from_local_db,
     sync_notes_from_firestore,
+    upsert_remote_notes,
+    get_sync_watermark,
+    release_db_connection,
     create_chat_session,
     get_chat_sessions,
     delete_chat_session,
-    add_chat_message,
-    get_chat_messages
+    add_chat_messages,
+    query_chat_messages,
+    get_chat_message,
+    search_notes,
+    search_chat_messages,
+    SNIPPET_START,
+    SNIPPET_END
 )
-from app.services.firebase_service import firebase_service
-from bot.bot_logic import parse_note_text
+from app.core.events import note_events
+from app.core.deadline_parser import parse_deadline
+from app.services import ai_service
+from app.services.storage import note_store
+from app.services.http_client import http_client
+from app.services.outbox_worker import outbox_worker
+from app.services.local_ipc import local_ipc
+from app.services.realtime_sync import realtime_sync
+from app.services.settings_service import settings_service
+from bot.webhook import telegram_webhook
+from app.utils import load_settings, parse_note_fields
 
 def serialize_notes_obj(note):
     return {
@@ -41,24 +76,74 @@ def serialize_notes_obj(note):
         "tanggal_deadline_str": note["tanggal_deadline_str"],
         "deadline_iso_str": note["deadline_iso_str"],
         "status": note["status"],
-        "user_id": note["user_id"]
+        "user_id": note["user_id"],
+        "priority": note["priority"]
     }
 
-with app.app_context():
-    init_local_db()
+def publish_note_changes(changes):
+    # Turn committed notes-table changes into targeted Socket.IO events that carry only
+    # the changed row and the event log revision.
+    latest = {}
+    for kind, note_id in changes:
+        latest[note_id] = kind
+    rows = {row['id']: row for row in get_local_notes_by_ids(
+        [note_id for note_id, kind in latest.items() if kind != 'deleted'])}
+    for note_id, kind in latest.items():
+        row = rows.get(note_id)
+        if row is None:
+            record = note_events.append('note_deleted', {"id": note_id})
+        else:
+            event = 'note_added' if kind == 'added' else 'note_updated'
+            record = note_events.append(event, {"note": serialize_notes_obj(row)})
+        socketio.emit(record["event"], record)
 
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {"telegram_token": "", "telegram_id": ""}
-    return {"telegram_token": "", "telegram_id": ""}
+add_notes_listener(publish_note_changes)
+
+def notes_snapshot():
+    revision = note_events.revision
+    return {"revision": revision, "notes": [serialize_notes_obj(note) for note in get_all_local_notes()]}
+
+@socketio.on('resync')
+def resync_notes(data):
+    since = int((data or {}).get('since', 0))
+    events = note_events.since(since)
+    if events is None:
+        emit('notes_snapshot', notes_snapshot())
+    else:
+        emit('notes_replay', {"revision": note_events.revision, "events": events})
+
+settings_watchers_started = threading.Event()
 
-def save_settings(data):
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+@app.before_request
+def start_background_services():
+    # Started on the first request rather than at import, so the debug reloader's
+    # parent process never runs a second worker.
+    outbox_worker.start()
+    local_ipc.start(apply_bot_notes)
+    if not settings_watchers_started.is_set():
+        settings_watchers_started.set()
+        telegram_webhook.sync_with_settings()
+        realtime_sync.sync_with_settings()
+
+def apply_bot_notes(notes):
+    # Notes the bot has just saved to Firestore: upserted locally, and the notes
+    # listener emits one Socket.IO event per note instead of a full resync.
+    try:
+        return len(upsert_remote_notes(notes))
+    finally:
+        release_db_connection()
+
+@app.teardown_appcontext
+def release_db(exception=None):
+    # Hand the request thread's SQLite connection back to the pool.
+    release_db_connection()
+
+def sync_user_notes(user_id):
+    watermark = get_sync_watermark(user_id)
+    firestore_notes = note_store.get_notes_for_user(user_id, since=watermark)
+    if firestore_notes is None:
+        return None
+    return sync_notes_from_firestore(firestore_notes, user_id=user_id, full_sync=watermark is None)
 
 @app.route('/')
 def serve_index():
@@ -71,19 +156,100 @@ def sync_with_firestore_api():
     if not user_id:
         return jsonify({"error": "Telegram User ID is not set in Settings."}), 400
     try:
-        firestore_notes_stream = firebase_service.get_notes_for_user(user_id)
-        sync_notes_from_firestore(list(firestore_notes_stream))
-        local_notes = get_all_local_notes()
-        socketio.emit('notes_updated', {'notes': [serialize_notes_obj(note) for note in local_notes]})
-        return jsonify({"message": "Synchronization successful"}), 200
+        stats = sync_user_notes(user_id)
+        if stats is None:
+            return jsonify({"error": "Could not reach Firestore."}), 502
+        return jsonify({"message": "Synchronization successful", **stats}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+NOTE_API_FIELDS = ("id", "mata_kuliah", "deskripsi_tugas", "deadline_timestamp",
+                   "tanggal_deadline_str", "deadline_iso_str", "status", "user_id", "priority")
+MAX_NOTES_PAGE_SIZE = 500
+
+def _encode_cursor(note):
+    raw = json.dumps([note["deadline_timestamp"], note["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    deadline_timestamp, note_id = json.loads(raw)
+    return int(deadline_timestamp), str(note_id)
+
+def _parse_deadline_bound(value, end_of_day=False):
+    # Accepts epoch seconds or an ISO date/datetime; a bare 'to' date covers the whole day.
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return int(parsed.timestamp())
+
+def _notes_validators():
+    # The notes revision changes on every committed write in this process, so it can
+    # answer conditional requests without touching SQLite.
+    query_hash = zlib.crc32(request.query_string)
+    etag = f"{note_events.instance_id}-{note_events.revision}-{query_hash:08x}"
+    return etag, note_events.last_modified
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    # HTTP dates have whole seconds. Rounding up is only safe once that second is over:
+    # until then another write can still land in it, so the date stays rounded down
+    # (and get_notes() answers 200 for it) rather than vouching for a list that may change.
+    http_date = min(math.ceil(last_modified), math.floor(time.time()))
+    response.last_modified = datetime.fromtimestamp(http_date, timezone.utc)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Notes-Revision'] = str(note_events.revision)
+    return response
+
 @app.route('/api/notes', methods=['GET'])
 def get_notes():
-    local_notes = get_all_local_notes()
-    notes_list = [serialize_notes_obj(note) for note in local_notes]
-    return jsonify(notes_list)
+    etag, last_modified = _notes_validators()
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified <= since.timestamp()
+    if not_modified:
+        return _with_validators(Response(status=304), etag, last_modified)
+
+    args = request.args
+    try:
+        status = [s for s in args.get('status', '').split(',') if s] or None
+        deadline_from = _parse_deadline_bound(args['from']) if args.get('from') else None
+        deadline_to = _parse_deadline_bound(args['to'], end_of_day=True) if args.get('to') else None
+        after = _decode_cursor(args['cursor']) if args.get('cursor') else None
+        limit = min(int(args['limit']), MAX_NOTES_PAGE_SIZE) if args.get('limit') else None
+    except (ValueError, TypeError, KeyError):
+        return jsonify({"error": "Invalid filter, cursor or limit parameter"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    fields = [f for f in args.get('fields', '').split(',') if f in NOTE_API_FIELDS] or list(NOTE_API_FIELDS)
+
+    paginated = limit is not None or after is not None
+    if paginated and limit is None:
+        limit = MAX_NOTES_PAGE_SIZE
+    # Fetch one extra row to know whether another page exists.
+    rows = query_local_notes(status=status, mata_kuliah=args.get('mata_kuliah') or None,
+                             deadline_from=deadline_from, deadline_to=deadline_to, after=after,
+                             limit=limit + 1 if paginated else None, columns=fields)
+    if not paginated:
+        body = [{field: row[field] for field in fields} for row in rows]
+    else:
+        page = rows[:limit]
+        body = {
+            "notes": [{field: row[field] for field in fields} for row in page],
+            "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None,
+            "revision": note_events.revision,
+        }
+    return _with_validators(jsonify(body), etag, last_modified)
+
+NOTE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+def _valid_note_id(note_id):
+    # Ids come from JSON, so a client may send a number or null instead of a string.
+    return isinstance(note_id, str) and NOTE_ID_PATTERN.match(note_id) is not None
 
 @app.route('/api/notes', methods=['POST'])
 def add_note_api():
@@ -92,19 +258,92 @@ def add_note_api():
     if not user_id:
         return jsonify({"error": "Telegram User ID is not set in Settings."}), 400
     data = request.get_json()
-    note_string = f"matkul {data.get('mata_kuliah')}, tugas {data.get('deskripsi_tugas')}, deadline {data.get('deadline')}"
-    parsed_data, error_message = parse_note_text(note_string)
+    # Clients send their own id so a retried POST cannot create a duplicate note.
+    note_id = data.get('id') or uuid.uuid4().hex
+    if not _valid_note_id(note_id):
+        return jsonify({"error": "Invalid note id"}), 400
+    parsed_data, error_message = parse_note_fields(data)
     if error_message:
         return jsonify({"error": error_message}), 400
-    doc_ref = firebase_service.add_note(parsed_data, user_id)
-    if doc_ref:
-        firestore_notes_stream = firebase_service.get_notes_for_user(user_id)
-        sync_notes_from_firestore(list(firestore_notes_stream))
-        local_notes = get_all_local_notes()
-        socketio.emit('notes_updated', {'notes': [serialize_notes_obj(note) for note in local_notes]})
-        return jsonify({"message": "Task added successfully"}), 201
-    else:
-        return jsonify({"error": "Failed to save to database"}), 500
+    parsed_data.update({"status": "pending", "user_id": int(user_id)})
+    # Saved locally first; the outbox worker pushes it to Firestore in the background.
+    created = create_local_note(note_id, parsed_data)
+    outbox_worker.wake()
+    if created:
+        return jsonify({"message": "Task added successfully", "id": note_id}), 201
+    return jsonify({"message": "Task already exists", "id": note_id}), 200
+
+MAX_BULK_ITEMS = 1000
+
+def _bulk_response(results, errors=None):
+    # Per-id outcome so clients can retry only the ids that failed.
+    items = [{"id": note_id, "result": result} for note_id, result in results.items()]
+    items.extend({"id": note_id, "result": "error", "error": error} for note_id, error in (errors or {}).items())
+    failed = sum(1 for item in items if item["result"] in ("error", "not_found"))
+    return jsonify({"results": items, "succeeded": len(items) - failed, "failed": failed}), 200
+
+def _bulk_ids(data):
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return None, "Field 'ids' must be a non-empty list"
+    if len(ids) > MAX_BULK_ITEMS:
+        return None, f"At most {MAX_BULK_ITEMS} ids per request"
+    return list(dict.fromkeys(str(note_id) for note_id in ids)), None
+
+@app.route('/api/notes/bulk', methods=['POST'])
+def bulk_add_notes_api():
+    settings = load_settings()
+    user_id = settings.get("telegram_id")
+    if not user_id:
+        return jsonify({"error": "Telegram User ID is not set in Settings."}), 400
+    data = request.get_json(silent=True) or {}
+    notes = data.get('notes')
+    if not isinstance(notes, list) or not notes:
+        return jsonify({"error": "Field 'notes' must be a non-empty list"}), 400
+    if len(notes) > MAX_BULK_ITEMS:
+        return jsonify({"error": f"At most {MAX_BULK_ITEMS} notes per request"}), 400
+
+    valid, errors = [], {}
+    for index, item in enumerate(notes):
+        if not isinstance(item, dict):
+            errors[f"#{index}"] = "Each note must be a JSON object"
+            continue
+        note_id = item.get('id') or uuid.uuid4().hex
+        if not _valid_note_id(note_id):
+            errors[note_id if isinstance(note_id, str) else f"#{index}"] = "Invalid note id"
+            continue
+        parsed_data, error_message = parse_note_fields(item)
+        if error_message:
+            errors[note_id] = error_message
+            continue
+        parsed_data.update({"status": item.get('status') or "pending", "user_id": int(user_id)})
+        valid.append((note_id, parsed_data))
+
+    results = bulk_create_local_notes(valid) if valid else {}
+    outbox_worker.wake()
+    return _bulk_response(results, errors)
+
+@app.route('/api/notes/bulk-status', methods=['PATCH'])
+def bulk_update_status_api():
+    data = request.get_json(silent=True) or {}
+    note_ids, error = _bulk_ids(data)
+    if error:
+        return jsonify({"error": error}), 400
+    new_status = data.get('status')
+    if not new_status:
+        return jsonify({"error": "New status is not given"}), 400
+    results = bulk_update_note_status(note_ids, new_status)
+    outbox_worker.wake()
+    return _bulk_response(results)
+
+@app.route('/api/notes/bulk', methods=['DELETE'])
+def bulk_delete_notes_api():
+    note_ids, error = _bulk_ids(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"error": error}), 400
+    results = bulk_delete_notes(note_ids)
+    outbox_worker.wake()
+    return _bulk_response(results)
 
 @app.route('/api/notes/<note_id>/status', methods=['PATCH'])
 def update_note_status_api(note_id):
@@ -112,19 +351,13 @@ def update_note_status_api(note_id):
     new_status = data.get('status')
     if not new_status:
         return jsonify({"error": "New status is not given"}), 400
-    firebase_service.update_note_status(note_id, new_status)
-    update_note_status(note_id, new_status)
-    # Emit setelah update status
-    local_notes = get_all_local_notes()
-    socketio.emit('notes_updated', {'notes': [serialize_notes_obj(note) for note in local_notes]})
+    if not update_note_status(note_id, new_status):
+        return jsonify({"error": "Note not found"}), 404
+    outbox_worker.wake()
     return jsonify({"message": f"Status note {note_id} changed successfully"}), 200
 
 @app.route('/api/notes/<note_id>', methods=['PUT'])
 def update_note_details_api(note_id):
-    import dateparser
-    settings = load_settings()
-    user_id = settings.get("telegram_id")
-    
     data = request.get_json()
     mata_kuliah = data.get('mata_kuliah')
     deskripsi_tugas = data.get('deskripsi_tugas')
@@ -134,7 +367,7 @@ def update_note_details_api(note_id):
          return jsonify({"error": "Fields mata_kuliah, deskripsi_tugas, deadline are required"}), 400
 
     # Parse Deadline
-    deadline_dt = dateparser.parse(deadline_str, settings={'PREFER_DATES_FROM': 'future', 'TIMEZONE': 'Asia/Jakarta'})
+    deadline_dt = parse_deadline(deadline_str)
     if not deadline_dt:
         return jsonify({"error": "Invalid date format"}), 400
     
@@ -146,29 +379,33 @@ def update_note_details_api(note_id):
         "deadline_iso_str": deadline_dt.strftime('%Y-%m-%d')
     }
 
-    success = firebase_service.update_note_fields(note_id, update_data)
-    
-    if success:
-        # Sync to update local DB
-        firestore_notes_stream = firebase_service.get_notes_for_user(user_id)
-        if firestore_notes_stream:
-             sync_notes_from_firestore(list(firestore_notes_stream))
-        
-        local_notes = get_all_local_notes()
-        socketio.emit('notes_updated', {'notes': [serialize_notes_obj(note) for note in local_notes]})
-        return jsonify({"message": "Note updated successfully"}), 200
-    else:
-        return jsonify({"error": "Failed to update note"}), 500
+    if not update_local_note_fields(note_id, update_data):
+        return jsonify({"error": "Note not found"}), 404
+    outbox_worker.wake()
+    return jsonify({"message": "Note updated successfully"}), 200
 
 @app.route('/api/notes/<note_id>', methods=['DELETE'])
 def delete_note_api(note_id):
-    firebase_service.delete_note(note_id)
-    delete_note_from_local_db(note_id)
-    # Emit setelah hapus
-    local_notes = get_all_local_notes()
-    socketio.emit('notes_updated', {'notes': [serialize_notes_obj(note) for note in local_notes]})
+    if not delete_note_from_local_db(note_id):
+        return jsonify({"error": "Note not found"}), 404
+    outbox_worker.wake()
     return jsonify({"message": f"Note {note_id} deleted successfully"}), 200
 
+@app.route('/api/outbox/failed', methods=['GET'])
+def get_failed_outbox_api():
+    # Writes the outbox worker gave up on, newest first.
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    return jsonify([dict(entry) for entry in get_failed_outbox(limit)]), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "outbox": get_outbox_stats(),
+        "http": http_client.stats(),
+        "ai_cache": ai_service.cache_stats(),
+        "realtime_sync": {"running": realtime_sync.running, **realtime_sync.stats}
+    })
+
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
     settings = load_settings()
@@ -176,72 +413,93 @@ def get_settings():
 
 @app.route('/api/settings', methods=['POST'])
 def update_settings():
-    new_settings = request.get_json()
-    save_settings(new_settings)
+    new_settings = request.get_json(silent=True)
+    try:
+        settings_service.update(new_settings)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"message": "Settings saved successfully."}), 200
 
-@app.route('/api/ask-ai', methods=['POST'])
-def ask_ai():
-    import requests
-    settings = load_settings()
-    
-    # Read API key from environment variable or settings
-    # Set environment variable: GROQ_API_KEY=your_key_here
-    api_key = os.environ.get("GROQ_API_KEY") or settings.get("groq_api_key")
-    
-    if not api_key or not api_key.strip():
-        return jsonify({"error": "GROQ_API_KEY not set. Please set environment variable or add to settings."}), 400
-        
-    data = request.get_json()
+def _ai_request():
+    # Parses the ask-ai request body, or raises AIServiceError.
+    data = request.get_json(silent=True) or {}
     prompt = data.get('prompt')
-    context = data.get('context', '')
-    
     if not prompt:
-        return jsonify({"error": "Prompt cannot be empty"}), 400
-        
-    full_prompt = f"""
-    Context (Tugas Saya):
-    {context}
-    
-    Pertanyaan/Perintah Saya:
-    {prompt}
-    
-    Tolong bantu saya dengan tugas ini. Jawab dengan format yang rapi dan mudah dibaca (gunakan Markdown).
-    """
-
-    
-    # === GROQ API HANDLING ===
-    print("Using Groq API...")
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key.strip()}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "messages": [
-            {"role": "system", "content": "You are 'Kanee', a smart and helpful AI assistant for a task management app. Your goal is to help users with their tasks (homework, programming, etc.) in a clear, educational, and easy-to-understand way. \n\nGUIDELINES:\n1. **Math**: Use LaTeX formatting for math equations (e.g., $E=mc^2$). Explain the steps clearly before showing the solution.\n2. **Programming**: When providing code, ALWAYS explain how it works efficiently. Use comments in code. \n3. **General**: Be friendly but professional. Use Markdown (bold, lists, headings) to make your answers neat and readable. Avoid complex jargon unless you explain it."},
-            {"role": "user", "content": full_prompt}
-        ],
-        "model": "llama-3.3-70b-versatile" 
+        raise ai_service.AIServiceError("Prompt cannot be empty", 400)
+    return {
+        "prompt": prompt,
+        "messages": ai_service.build_messages(prompt, data.get('context', ''), data.get('session_id')),
+        "session_id": data.get('session_id'),
+        "no_cache": bool(data.get('no_cache')),
     }
-    
+
+def _save_ai_exchange(ask, generated_text):
+    # Save messages to session if session_id provided
+    if ask["session_id"]:
+        add_chat_messages(ask["session_id"], [('user', ask["prompt"]), ('ai', generated_text)])
+
+@app.route('/api/ask-ai', methods=['POST'])
+def ask_ai():
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code != 200:
-            print(f"Groq API Error: {response.text}")
-            return jsonify({"error": f"Groq Error: {response.json().get('error', {}).get('message', 'Unknown error')}"}), 500
-        
-        generated_text = response.json()['choices'][0]['message']['content']
-        
-        # Save messages to session if session_id provided
-        session_id = data.get('session_id')
-        if session_id:
-            add_chat_message(session_id, 'user', prompt)
-            add_chat_message(session_id, 'ai', generated_text)
-        
-        return jsonify({"response": generated_text}), 200
-    except Exception as e:
-        return jsonify({"error": f"Groq Connection Error: {str(e)}"}), 500
+        ask = _ai_request()
+        generated_text = ai_service.get_cached(ask["messages"], ask["no_cache"])
+        cached = generated_text is not None
+        if not cached:
+            api_key = ai_service.get_api_key(load_settings())
+            print("Using Groq API...")
+            generated_text = ai_service.complete(api_key, ask["messages"])
+            ai_service.store_cached(ask["messages"], generated_text)
+    except ai_service.AIServiceError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    _save_ai_exchange(ask, generated_text)
+    return jsonify({"response": generated_text, "cached": cached}), 200
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/ask-ai/stream', methods=['POST'])
+def ask_ai_stream():
+    # Same request body as /api/ask-ai, answered as Server-Sent Events: a "token" event
+    # per chunk from Groq, then "done" with the full text (or "error"). A cached answer
+    # is sent as a single token.
+    try:
+        ask = _ai_request()
+        cached_text = ai_service.get_cached(ask["messages"], ask["no_cache"])
+        api_key = ai_service.get_api_key(load_settings()) if cached_text is None else None
+    except ai_service.AIServiceError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    def generate():
+        # Runs while the response is streamed, after teardown_appcontext has already
+        # released this thread's connection, so the saves below take a new one and give it
+        # back here.
+        try:
+            if cached_text is not None:
+                _save_ai_exchange(ask, cached_text)
+                yield _sse("token", {"text": cached_text})
+                yield _sse("done", {"response": cached_text, "cached": True})
+                return
+            parts = []
+            try:
+                for text in ai_service.stream_completion(api_key, ask["messages"]):
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+            except ai_service.AIServiceError as e:
+                yield _sse("error", {"error": str(e)})
+                return
+            generated_text = "".join(parts)
+            # Only a finished answer is saved or cached; a dropped stream leaves both as they were.
+            ai_service.store_cached(ask["messages"], generated_text)
+            _save_ai_exchange(ask, generated_text)
+            yield _sse("done", {"response": generated_text, "cached": False})
+        finally:
+            release_db_connection()
+
+    if cached_text is None:
+        print("Using Groq API (streaming)...")
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # ================= CHAT SESSION ENDPOINTS =================
 
@@ -262,10 +520,121 @@ def delete_session(session_id):
     delete_chat_session(session_id)
     return jsonify({"message": f"Session {session_id} deleted"}), 200
 
+MAX_CHAT_PAGE_SIZE = 200
+
+def _serialize_chat_message(m, truncate=None):
+    message = {"id": m["id"], "sender": m["sender"], "content": m["content"], "timestamp": m["timestamp"]}
+    if truncate is not None:
+        message["truncated"] = m["content_length"] > truncate
+        message["content_length"] = m["content_length"]
+    return message
+
 @app.route('/api/chat-sessions/<int:session_id>/messages', methods=['GET'])
 def get_session_messages(session_id):
-    messages = get_chat_messages(session_id)
-    return jsonify([{"id": m["id"], "sender": m["sender"], "content": m["content"], "timestamp": m["timestamp"]} for m in messages])
+    # Without parameters the whole conversation is returned as a list. `limit`, `before`
+    # and `since` (message ids) switch to a page object; `truncate=N` shortens each
+    # message to N characters (the full text is at /messages/<id>).
+    args = request.args
+    try:
+        limit = min(int(args['limit']), MAX_CHAT_PAGE_SIZE) if args.get('limit') else None
+        before = int(args['before']) if args.get('before') else None
+        since = int(args['since']) if args.get('since') else None
+        truncate = int(args['truncate']) if args.get('truncate') else None
+    except ValueError:
+        return jsonify({"error": "limit, before, since and truncate must be integers"}), 400
+    if (limit is not None and limit < 1) or (truncate is not None and truncate < 1):
+        return jsonify({"error": "limit and truncate must be positive integers"}), 400
+    if before is not None and since is not None:
+        return jsonify({"error": "Use either before or since, not both"}), 400
+
+    paginated = limit is not None or before is not None or since is not None
+    if not paginated:
+        rows = query_chat_messages(session_id, truncate=truncate)
+        return jsonify([_serialize_chat_message(m, truncate) for m in rows])
+
+    limit = limit or MAX_CHAT_PAGE_SIZE
+    # Fetch one extra row to know whether there is more in the paging direction.
+    rows = query_chat_messages(session_id, before=before, since=since, limit=limit + 1, truncate=truncate)
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit] if since is not None else rows[1:]
+    return jsonify({
+        "messages": [_serialize_chat_message(m, truncate) for m in rows],
+        "has_more": has_more,
+        # Older page: pass as `before`. Newer messages: pass latest_id as `since`.
+        "next_before": rows[0]["id"] if rows and (has_more and since is None) else None,
+        "latest_id": rows[-1]["id"] if rows else since,
+    })
+
+@app.route('/api/chat-sessions/<int:session_id>/messages/<int:message_id>', methods=['GET'])
+def get_session_message(session_id, message_id):
+    message = get_chat_message(session_id, message_id)
+    if message is None:
+        return jsonify({"error": "Message not found"}), 404
+    return jsonify(_serialize_chat_message(message))
+
+# ================= TELEGRAM WEBHOOK =================
+
+@app.route(TELEGRAM_WEBHOOK_PATH, methods=['POST'])
+def receive_telegram_update():
+    # Used when telegram_mode is 'webhook'. Telegram retries anything but a 200, so a
+    # full queue answers 503 to have the update delivered again later.
+    if not telegram_webhook.running:
+        return jsonify({"error": "Webhook mode is not active"}), 503
+    if not telegram_webhook.verify(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        return jsonify({"error": "Invalid secret token"}), 403
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'update_id' not in data:
+        return jsonify({"error": "Invalid update"}), 400
+    if telegram_webhook.submit(data) == 'full':
+        return jsonify({"error": "Update queue is full"}), 503
+    return jsonify({"ok": True}), 200
+
+# ================= SEARCH =================
+
+MAX_SEARCH_RESULTS = 100
+
+def _highlight(snippet):
+    # Escapes the snippet text, then marks the matched terms.
+    return html.escape(snippet or '').replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    # ?q=<words>[&type=notes|messages|all][&limit=N]. Words match as prefixes and all
+    # must appear; results are ranked by bm25 with highlighted HTML snippets.
+    text = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'all')
+    if kind not in ('notes', 'messages', 'all'):
+        return jsonify({"error": "type must be notes, messages or all"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not text or limit < 1:
+        return jsonify({"query": text, "notes": [], "messages": []})
+
+    result = {"query": text}
+    if kind in ('notes', 'all'):
+        result["notes"] = [{
+            "id": n["id"],
+            "mata_kuliah": n["mata_kuliah"],
+            "deskripsi_tugas": n["deskripsi_tugas"],
+            "tanggal_deadline_str": n["tanggal_deadline_str"],
+            "status": n["status"],
+            "snippet": _highlight(n["snippet"]),
+            "rank": n["rank"],
+        } for n in search_notes(text, limit)]
+    if kind in ('messages', 'all'):
+        result["messages"] = [{
+            "id": m["id"],
+            "session_id": m["session_id"],
+            "session_title": m["session_title"],
+            "sender": m["sender"],
+            "timestamp": m["timestamp"],
+            "snippet": _highlight(m["snippet"]),
+            "rank": m["rank"],
+        } for m in search_chat_messages(text, limit)]
+    return jsonify(result)
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, port=5000)
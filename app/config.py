@@ -5,4 +5,73 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CRED_PATH = os.path.join(BASE_DIR, "firebase-credentials.json") 
 DB_PATH = os.path.join(BASE_DIR, "notes.db")
-SETTINGS_FILE = os.path.join(BASE_DIR, "settings.json")
\ No newline at end of file
+SETTINGS_FILE = os.path.join(BASE_DIR, "settings.json")
+
+# SQLite connection manager
+DB_BUSY_TIMEOUT = 10  # seconds to wait on a locked database before failing
+DB_POOL_SIZE = 8  # idle connections kept for reuse by request threads
+DB_STATEMENT_CACHE_SIZE = 256
+DB_CACHE_SIZE_KB = 16384
+DB_MMAP_SIZE = 64 * 1024 * 1024
+
+# Deadline reminders are sent this many seconds before each deadline.
+REMINDER_OFFSETS = (24 * 3600, 3 * 3600, 30 * 60)
+# Reminders due together are merged into one summary per 'day' or per 'course';
+# 'off' sends one notification per note.
+NOTIFIER_BATCH_MODE = "day"
+NOTIFIER_MAX_PER_MINUTE = 6
+
+# Groq's OpenAI-compatible chat completions API. The URL can be pointed at another
+# compatible server (or a local stub) through the environment.
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+AI_CONNECT_TIMEOUT = 10  # seconds
+AI_READ_TIMEOUT = 120  # seconds between streamed chunks
+
+# Outbound HTTP client (app/services/http_client.py)
+HTTP_CONNECT_TIMEOUT = 5  # seconds
+HTTP_READ_TIMEOUT = 30  # seconds
+HTTP_POOL_SIZE = 10  # keep-alive connections kept per host
+HTTP_MAX_PER_HOST = 4  # requests in flight per host; further callers wait
+HTTP_MAX_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.5  # seconds, doubled on each retry
+HTTP_RETRY_BACKOFF_MAX = 30
+HTTP_RETRY_BUDGET_RATIO = 0.2  # retries allowed as a fraction of requests, so outages are not amplified
+LOCAL_API_URL = os.environ.get("NOTES_APP_API_URL", "http://127.0.0.1:5000")
+
+# AI answers are cached by (model, system prompt, context, prompt).
+AI_CACHE_TTL = 7 * 24 * 3600  # seconds
+AI_CACHE_MAX_ENTRIES = 500
+
+# Chat history sent with each AI request (app/core/chat_context.py), in estimated tokens.
+CHAT_CONTEXT_TOKEN_BUDGET = 3000
+CHAT_SUMMARY_MAX_TOKENS = 500
+
+# Telegram bot: updates handled concurrently, blocking work (Firestore, parsing, HTTP)
+# runs on a bounded thread pool so the event loop keeps serving other chats.
+BOT_CONCURRENT_UPDATES = 32
+BOT_WORKER_THREADS = 8
+# Bot API endpoint; point it at a local stub to exercise the bot without reaching Telegram.
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+TELEGRAM_WEBHOOK_PATH = "/telegram/webhook"
+TELEGRAM_WEBHOOK_QUEUE_SIZE = 1000  # updates accepted but not yet dispatched
+
+# Local IPC between the bot and the desktop app (app/services/local_ipc.py). The running
+# app writes its address and a per-run token here and removes the file on shutdown; a file
+# left by a crash fails the connect, and the bot falls back to requesting a sync.
+IPC_INFO_FILE = os.path.join(BASE_DIR, "ipc.json")
+IPC_TIMEOUT = 2  # seconds
+
+# Realtime sync (app/services/realtime_sync.py), enabled by the realtime_sync setting.
+REALTIME_CHECK_INTERVAL = 5  # seconds between checks that the Firestore listener is alive
+REALTIME_BACKOFF_BASE = 2  # seconds before the first reconnect
+REALTIME_BACKOFF_MAX = 300
+
+# Where notes live besides the local cache (app/services/note_store.py): 'firestore',
+# 'sqlite' (a local document store, for running fully offline) or 'memory' (an in-process
+# fake with injectable latency and failures, for benchmarks and load tests).
+STORAGE_BACKEND = os.environ.get("NOTES_APP_BACKEND", "firestore")
+LOCAL_STORE_PATH = os.path.join(BASE_DIR, "notes_store.db")
+MEMORY_STORE_LATENCY = float(os.environ.get("NOTES_APP_MEMORY_LATENCY_MS", "0")) / 1000
+MEMORY_STORE_FAILURE_RATE = float(os.environ.get("NOTES_APP_MEMORY_FAILURE_RATE", "0"))
+MEMORY_STORE_SEED = os.environ.get("NOTES_APP_MEMORY_SEED")
@@ -0,0 +1,119 @@
+# File: app/core/chat_context.py
+
+import math
+import re
+from app.config import CHAT_CONTEXT_TOKEN_BUDGET, CHAT_SUMMARY_MAX_TOKENS
+from .database import query_chat_messages, get_chat_summary, save_chat_summary
+
+CHARS_PER_TOKEN = 4  # rough average for Llama-style tokenizers on Indonesian/English text
+MESSAGE_OVERHEAD_TOKENS = 4  # role markers and separators per chat message
+SUMMARY_LINE_CHARS = 200
+HISTORY_PAGE_SIZE = 50  # messages read per query while walking a session
+
+ROLES = {'user': 'user', 'ai': 'assistant'}
+SPEAKERS = {'user': 'User', 'ai': 'Kanee'}
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+_CODE_BLOCK_RE = re.compile(r'```.*?(```|$)', re.DOTALL)
+
+def estimate_tokens(text):
+    # Character-based estimate; close enough for budgeting without loading a tokenizer.
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+def _summarize_message(message):
+    # One line per message: its first sentence, with code blocks and markup removed.
+    text = _CODE_BLOCK_RE.sub(' [code] ', message['content'])
+    text = ' '.join(text.replace('#', '').replace('*', '').split())
+    first = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS - 3].rstrip() + '...'
+    return f"{SPEAKERS.get(message['sender'], message['sender'])}: {first}"
+
+def _trim_summary(summary, max_tokens=CHAT_SUMMARY_MAX_TOKENS):
+    # Keeps the newest lines that fit; the oldest parts of the conversation go first.
+    lines = summary.split('\n')
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+def _rolling_summary(session_id, cut):
+    # Returns (summary, upto_id) covering every message before id `cut`. The stored
+    # summary is extended with only the messages it has not seen yet, read a page at a time.
+    stored = get_chat_summary(session_id)
+    summary, upto_id = (stored['summary'], stored['upto_message_id']) if stored else ('', 0)
+    changed = False
+    while True:
+        new = query_chat_messages(session_id, since=upto_id, before=cut, limit=HISTORY_PAGE_SIZE)
+        if not new:
+            break
+        lines = ([summary] if summary else []) + [_summarize_message(m) for m in new]
+        summary = _trim_summary('\n'.join(lines))
+        upto_id = new[-1]['id']
+        changed = True
+        if len(new) < HISTORY_PAGE_SIZE:
+            break
+    if changed:
+        save_chat_summary(session_id, upto_id, summary)
+    return summary, upto_id
+
+def _newest_messages(session_id, available):
+    # Walks the session newest first, a page at a time, until `available` tokens are used.
+    # Returns (messages newest first, newest id, whether the whole session fit).
+    messages, used, before, newest_id = [], 0, None, None
+    while True:
+        page = query_chat_messages(session_id, before=before, limit=HISTORY_PAGE_SIZE)
+        for message in reversed(page):
+            if newest_id is None:
+                newest_id = message['id']
+            used += message_tokens(message)
+            if used > available:
+                return messages, newest_id, False
+            messages.append(dict(message))
+        if len(page) < HISTORY_PAGE_SIZE:
+            return messages, newest_id, True
+        before = page[0]['id']
+
+def build_history(session_id, reserved_tokens=0, budget=CHAT_CONTEXT_TOKEN_BUDGET):
+    # Returns (summary, recent) for a session: `recent` are the newest messages that fit
+    # the budget verbatim, `summary` (possibly empty) condenses everything before them.
+    # `reserved_tokens` is what the system prompt and the new question already use.
+    # Only the newest messages that can fit and the ones the stored summary has not
+    # covered yet are read, so long sessions do not load their whole history per ask.
+    if not session_id:
+        return '', []
+    available = budget - reserved_tokens
+    newest, newest_id, complete = _newest_messages(session_id, available)
+    if newest_id is None:
+        return '', []
+    if complete:
+        return '', newest[::-1]
+
+    # Room is left for the summary; the newest turns go in verbatim until the rest is full.
+    limit = available - CHAT_SUMMARY_MAX_TOKENS
+    recent, used = [], 0
+    for message in newest:
+        cost = message_tokens(message)
+        if used + cost > limit:
+            break
+        recent.append(message)
+        used += cost
+    recent.reverse()
+
+    cut = recent[0]['id'] if recent else newest_id + 1
+    summary, upto_id = _rolling_summary(session_id, cut)
+    # A summary that already reaches into the verbatim window (the budget shrank since
+    # it was written) wins, so nothing is sent twice.
+    recent = [m for m in recent if m['id'] > upto_id]
+    return summary, recent
+
+def history_messages(session_id, reserved_tokens=0, budget=CHAT_CONTEXT_TOKEN_BUDGET):
+    # build_history() in the chat completions message format.
+    summary, recent = build_history(session_id, reserved_tokens, budget)
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend({"role": ROLES.get(m['sender'], 'user'), "content": m['content']} for m in recent)
+    return messages
@@ -1,17 +1,117 @@
 # File: app/core/database.py
 
+import json
+import queue
+import re
 import sqlite3
-from datetime import datetime, timezone, timedelta
-from app.config import DB_PATH
+import threading
+import time
+from datetime import datetime
+from app.config import (
+    DB_PATH,
+    DB_BUSY_TIMEOUT,
+    DB_POOL_SIZE,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE
+)
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+# ================= CONNECTION MANAGER =================
+# Each thread gets one connection, bound to it until release_db_connection()
+# hands it back to a small idle pool. Request threads release on teardown;
+# long-lived threads (notifier, workers) simply keep theirs.
+
+class PooledConnection(sqlite3.Connection):
+    pass
+
+_thread_state = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_idle_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=PooledConnection
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.db_path = DB_PATH
+    # The schema is brought up to date by the first connection each process opens,
+    # so importing this module does no I/O.
+    if DB_PATH not in _schema_ready:
+        with _schema_lock:
+            if DB_PATH not in _schema_ready:
+                _ensure_schema(conn)
+                _schema_ready.add(DB_PATH)
     return conn
 
-def init_local_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def get_db_connection():
+    conn = getattr(_thread_state, 'conn', None)
+    if conn is not None and conn.db_path == DB_PATH:
+        return conn
+    conn = None
+    while conn is None:
+        try:
+            candidate = _idle_pool.get_nowait()
+        except queue.Empty:
+            conn = _open_connection()
+            break
+        if candidate.db_path == DB_PATH:
+            conn = candidate
+        else:
+            candidate.close()
+    _thread_state.conn = conn
+    return conn
+
+def release_db_connection():
+    conn = getattr(_thread_state, 'conn', None)
+    if conn is None:
+        return
+    _thread_state.conn = None
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _idle_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+# ================= CHANGE LISTENERS =================
+# Callbacks receive a list of (kind, note_id) tuples after a write commits, where
+# kind is 'added', 'updated' or 'deleted'. Used to wake the deadline scheduler.
+
+_notes_listeners = []
+
+def add_notes_listener(callback):
+    if callback not in _notes_listeners:
+        _notes_listeners.append(callback)
+
+def remove_notes_listener(callback):
+    if callback in _notes_listeners:
+        _notes_listeners.remove(callback)
+
+def _notify_notes_listeners(changes):
+    if not changes:
+        return
+    for callback in list(_notes_listeners):
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"Error in notes listener {callback}: {e}")
+
+# ================= SCHEMA MIGRATIONS =================
+# PRAGMA user_version records the last applied migration. Migrations must be safe
+# on databases created before versioning existed, hence the IF NOT EXISTS guards.
+
+def _migration_base_schema(cursor):
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS notes (
             id TEXT PRIMARY KEY,
@@ -21,7 +121,7 @@ def init_local_db():
             tanggal_deadline_str TEXT,
             deadline_iso_str TEXT,
             status TEXT DEFAULT 'pending',
-            user_id INTEGER 
+            user_id INTEGER
         )
     ''')
 
@@ -43,107 +143,851 @@ def init_local_db():
             FOREIGN KEY(session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
         )
     ''')
-    conn.commit()
-    conn.close()
-    print("Local database initialized with correct schema (notes, chats).")
+
+def _migration_delta_sync(cursor):
+    note_columns = [row['name'] for row in cursor.execute("PRAGMA table_info(notes)")]
+    if 'updated_at' not in note_columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN updated_at REAL DEFAULT 0")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+def _migration_hot_path_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_status_deadline ON notes (status, deadline_timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_deadline ON notes (deadline_timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_created ON chat_sessions (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session_ts ON chat_messages (session_id, timestamp)")
+
+def _migration_note_reminders(cursor):
+    # One row per reminder offset already delivered for a given deadline, so editing
+    # the deadline re-arms every reminder for the note.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS note_reminders (
+            note_id TEXT NOT NULL,
+            offset_seconds INTEGER NOT NULL,
+            deadline_timestamp INTEGER NOT NULL,
+            sent_at INTEGER,
+            PRIMARY KEY (note_id, offset_seconds, deadline_timestamp)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_reminders_deadline ON note_reminders (deadline_timestamp)")
+
+def _migration_note_pagination_indexes(cursor):
+    # Keyset pagination orders by (deadline_timestamp, id); the id column lets the
+    # index satisfy both the ORDER BY and the cursor comparison.
+    cursor.execute("DROP INDEX IF EXISTS idx_notes_deadline")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_deadline_id ON notes (deadline_timestamp, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_course_deadline ON notes (mata_kuliah, deadline_timestamp, id)")
+
+def _migration_outbox(cursor):
+    # Remote mutations waiting to be pushed to Firestore. Rows are written in the same
+    # transaction as the local change, so nothing is lost if the app exits first.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            note_id TEXT NOT NULL,
+            payload TEXT,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox (next_attempt_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_note ON outbox (note_id)")
+
+def _migration_outbox_failed(cursor):
+    # Outbox entries that gave up (too many attempts, or a permanent error such as an
+    # update to a note deleted remotely). Kept for inspection; sync no longer waits on them.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_failed (
+            id INTEGER PRIMARY KEY,
+            op TEXT NOT NULL,
+            note_id TEXT NOT NULL,
+            payload TEXT,
+            attempts INTEGER,
+            last_error TEXT,
+            created_at REAL,
+            failed_at REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_failed_failed_at ON outbox_failed (failed_at)")
+
+def _migration_note_status_index(cursor):
+    # Board columns page through one status at a time (GET /api/notes?status=...), in
+    # the same (deadline_timestamp, id) order as idx_notes_deadline_id. It also serves
+    # every query the narrower (status, deadline_timestamp) index did.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_status_deadline_id ON notes (status, deadline_timestamp, id)")
+    cursor.execute("DROP INDEX IF EXISTS idx_notes_status_deadline")
+
+def _migration_ai_cache_created_index(cursor):
+    # The TTL sweep in put_cached_ai_response() deletes by created_at on every store.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_created ON ai_response_cache (created_at)")
+
+def _migration_note_priority(cursor):
+    note_columns = [row['name'] for row in cursor.execute("PRAGMA table_info(notes)")]
+    if 'priority' not in note_columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN priority TEXT")
+
+def _migration_ai_response_cache(cursor):
+    # Answers from the AI endpoint keyed by a hash of everything sent to the model.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_response_cache (last_used_at)")
+
+def _migration_chat_summaries(cursor):
+    # Rolling extractive summary of a session's older messages, covering ids up to
+    # upto_message_id, so it is only ever extended and never recomputed.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            session_id INTEGER PRIMARY KEY,
+            upto_message_id INTEGER NOT NULL,
+            summary TEXT NOT NULL,
+            updated_at REAL
+        )
+    ''')
+
+def _migration_chat_message_id_index(cursor):
+    # Chat history is paged and replayed by message id within a session.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages (session_id, id)")
+
+_FTS_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts (rowid, mata_kuliah, deskripsi_tugas)
+        VALUES (new.rowid, new.mata_kuliah, new.deskripsi_tugas);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, mata_kuliah, deskripsi_tugas)
+        VALUES ('delete', old.rowid, old.mata_kuliah, old.deskripsi_tugas);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF mata_kuliah, deskripsi_tugas ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, mata_kuliah, deskripsi_tugas)
+        VALUES ('delete', old.rowid, old.mata_kuliah, old.deskripsi_tugas);
+        INSERT INTO notes_fts (rowid, mata_kuliah, deskripsi_tugas)
+        VALUES (new.rowid, new.mata_kuliah, new.deskripsi_tugas);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF content ON chat_messages BEGIN
+        INSERT INTO chat_messages_fts (chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO chat_messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''',
+)
+
+def _migration_full_text_search(cursor):
+    # External-content FTS5 indexes over note text and chat messages. Triggers keep them
+    # in step with their tables; 'rebuild' indexes the rows that already exist.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            mata_kuliah, deskripsi_tugas,
+            content='notes', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+            content,
+            content='chat_messages', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    for trigger in _FTS_TRIGGERS:
+        cursor.execute(trigger)
+    cursor.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')")
+
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_delta_sync),
+    (3, _migration_hot_path_indexes),
+    (4, _migration_note_reminders),
+    (5, _migration_note_pagination_indexes),
+    (6, _migration_outbox),
+    (7, _migration_note_priority),
+    (8, _migration_ai_response_cache),
+    (9, _migration_chat_summaries),
+    (10, _migration_chat_message_id_index),
+    (11, _migration_full_text_search),
+    (12, _migration_outbox_failed),
+    (13, _migration_note_status_index),
+    (14, _migration_ai_cache_created_index),
+]
+
+def migrate(conn):
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {version}: {migration.__name__}")
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# Only the oldest entry of each note is due, so a note's mutations reach Firestore in order.
+DUE_OUTBOX_SQL = (
+    "SELECT * FROM outbox AS o WHERE next_attempt_at <= ? "
+    "AND NOT EXISTS (SELECT 1 FROM outbox AS p WHERE p.note_id = o.note_id AND p.id < o.id) "
+    "ORDER BY next_attempt_at, id LIMIT ?"
+)
+
+def _ensure_schema(conn):
+    version = migrate(conn)
+    print(f"Local database initialized at schema version {version}.")
 
 # ================= CHAT FUNCTIONS =================
 
 def create_chat_session(title):
     conn = get_db_connection()
-    cursor = conn.cursor()
     created_at = int(datetime.now().timestamp())
-    cursor.execute("INSERT INTO chat_sessions (title, created_at) VALUES (?, ?)", (title, created_at))
-    session_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return session_id
+    with conn:
+        cursor = conn.execute("INSERT INTO chat_sessions (title, created_at) VALUES (?, ?)", (title, created_at))
+    return cursor.lastrowid
 
 def get_chat_sessions():
     conn = get_db_connection()
     sessions = conn.execute("SELECT * FROM chat_sessions ORDER BY created_at DESC").fetchall()
-    conn.close()
     return sessions
 
 def delete_chat_session(session_id):
     conn = get_db_connection()
-    conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
-    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+        conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM chat_summaries WHERE session_id = ?", (session_id,))
 
 def add_chat_message(session_id, sender, content):
+    add_chat_messages(session_id, [(sender, content)])
+
+def add_chat_messages(session_id, messages):
+    # Inserts (sender, content) pairs in one transaction, e.g. both halves of an AI turn.
     conn = get_db_connection()
     timestamp = int(datetime.now().timestamp())
-    conn.execute("INSERT INTO chat_messages (session_id, sender, content, timestamp) VALUES (?, ?, ?, ?)", 
-                 (session_id, sender, content, timestamp))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.executemany("INSERT INTO chat_messages (session_id, sender, content, timestamp) VALUES (?, ?, ?, ?)",
+                         [(session_id, sender, content, timestamp) for sender, content in messages])
 
 def get_chat_messages(session_id):
     conn = get_db_connection()
-    messages = conn.execute("SELECT * FROM chat_messages WHERE session_id = ? ORDER BY timestamp ASC", (session_id,)).fetchall()
-    conn.close()
+    messages = conn.execute("SELECT * FROM chat_messages WHERE session_id = ? ORDER BY id ASC", (session_id,)).fetchall()
     return messages
 
-def sync_notes_from_firestore(firestore_notes):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    print("Deleting old data from local database...")
-    cursor.execute("DELETE FROM notes")
-
-    count = 0
-    for note in firestore_notes:
-        data = note.to_dict()
-        if data.get('mata_kuliah') and data.get('deadline_timestamp'):
-            cursor.execute('''
-                INSERT INTO notes (id, mata_kuliah, deskripsi_tugas, deadline_timestamp, tanggal_deadline_str, deadline_iso_str, status, user_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                note.id,
+def query_chat_messages(session_id, before=None, since=None, limit=None, truncate=None):
+    # Keyset pagination by message id. `since` returns messages newer than that id, oldest
+    # first; otherwise the newest `limit` messages are returned, still oldest first. Either
+    # way `before` excludes that id and newer ones. With `truncate`, content is cut to
+    # that many characters in SQL and `content_length` tells the caller how long the full
+    # text is.
+    conn = get_db_connection()
+    if truncate is not None:
+        columns = "id, sender, timestamp, substr(content, 1, ?) AS content, length(content) AS content_length"
+        params = [truncate, session_id]
+    else:
+        columns = "id, sender, timestamp, content, length(content) AS content_length"
+        params = [session_id]
+    query = f"SELECT {columns} FROM chat_messages WHERE session_id = ?"
+    if since is not None:
+        query += " AND id > ?"
+        params.append(since)
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id ASC"
+        newest_first = False
+    else:
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC"
+        newest_first = True
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    rows = conn.execute(query, params).fetchall()
+    return rows[::-1] if newest_first else rows
+
+def get_chat_message(session_id, message_id):
+    conn = get_db_connection()
+    return conn.execute("SELECT * FROM chat_messages WHERE session_id = ? AND id = ?",
+                        (session_id, message_id)).fetchone()
+
+def get_chat_summary(session_id):
+    conn = get_db_connection()
+    return conn.execute("SELECT upto_message_id, summary FROM chat_summaries WHERE session_id = ?",
+                        (session_id,)).fetchone()
+
+def save_chat_summary(session_id, upto_message_id, summary):
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_summaries (session_id, upto_message_id, summary, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (session_id, upto_message_id, summary, time.time())
+        )
+
+# ================= AI RESPONSE CACHE =================
+
+def get_cached_ai_response(cache_key, now_ts, ttl):
+    # Returns the cached text, or None when missing or older than `ttl` seconds.
+    conn = get_db_connection()
+    with conn:
+        row = conn.execute("SELECT response, created_at FROM ai_response_cache WHERE cache_key = ?",
+                           (cache_key,)).fetchone()
+        if row is None:
+            return None
+        if row['created_at'] < now_ts - ttl:
+            conn.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (cache_key,))
+            return None
+        conn.execute("UPDATE ai_response_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                     (now_ts, cache_key))
+    return row['response']
+
+def put_cached_ai_response(cache_key, response, now_ts, max_entries, ttl):
+    # Stores an answer, then drops expired rows and the least recently used ones
+    # beyond `max_entries`.
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ai_response_cache (cache_key, response, created_at, last_used_at, hits) "
+            "VALUES (?, ?, ?, ?, 0)",
+            (cache_key, response, now_ts, now_ts)
+        )
+        conn.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (now_ts - ttl,))
+        conn.execute(
+            "DELETE FROM ai_response_cache WHERE cache_key IN ("
+            "SELECT cache_key FROM ai_response_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,)
+        )
+
+def get_ai_cache_size():
+    conn = get_db_connection()
+    return conn.execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()[0]
+
+# ================= SYNC FUNCTIONS =================
+
+NOTE_FIELDS = ('mata_kuliah', 'deskripsi_tugas', 'deadline_timestamp', 'tanggal_deadline_str',
+               'deadline_iso_str', 'status', 'user_id', 'priority', 'updated_at')
+
+NOTE_INSERT_COLUMNS = f"id, {', '.join(NOTE_FIELDS)}"
+NOTE_INSERT_PLACEHOLDERS = ", ".join("?" * (len(NOTE_FIELDS) + 1))
+
+def _watermark_key(user_id):
+    return f"notes_watermark:{user_id}"
+
+def _to_epoch(value):
+    if value is None:
+        return 0
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return float(value)
+
+def get_sync_watermark(user_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (_watermark_key(user_id),)).fetchone()
+    return float(row['value']) if row else None
+
+# With full_sync the documents are the user's whole collection and local rows missing
+# from it are removed; otherwise they are only the documents changed since the stored
+# watermark. Documents flagged 'deleted' are tombstones. Everything runs in one transaction.
+def sync_notes_from_firestore(firestore_notes, user_id=None, full_sync=True, removed_ids=()):
+    # `removed_ids` are notes that Firestore reported as gone (a realtime listener's
+    # REMOVED changes); like soft-deleted notes they are dropped locally.
+    removed_ids = set(removed_ids)
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.cursor()
+        stats = {"inserted": 0, "updated": 0, "deleted": 0}
+        watermark = get_sync_watermark(user_id) if user_id is not None else None
+
+        if full_sync:
+            existing = {row['id']: row for row in cursor.execute("SELECT * FROM notes")}
+        else:
+            existing = None
+        # Local edits not yet pushed to Firestore win over the remote copy.
+        pending_ids = {row['note_id'] for row in cursor.execute("SELECT DISTINCT note_id FROM outbox")}
+
+        seen_ids = set()
+        changes = []
+        for note in firestore_notes:
+            data = note.to_dict()
+            updated_at = _to_epoch(data.get('updated_at'))
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+            seen_ids.add(note.id)
+            if note.id in pending_ids:
+                continue
+
+            if existing is None:
+                current = cursor.execute("SELECT * FROM notes WHERE id = ?", (note.id,)).fetchone()
+            else:
+                current = existing.get(note.id)
+
+            if data.get('deleted') or not (data.get('mata_kuliah') and data.get('deadline_timestamp')):
+                if current is not None:
+                    cursor.execute("DELETE FROM notes WHERE id = ?", (note.id,))
+                    stats["deleted"] += 1
+                    changes.append(('deleted', note.id))
+                continue
+
+            row = (
                 data.get('mata_kuliah'),
                 data.get('deskripsi_tugas'),
                 data.get('deadline_timestamp'),
                 data.get('tanggal_deadline_str'),
                 data.get('deadline_iso_str'),
                 data.get('status', 'pending'),
-                data.get('user_id')
-            ))
-            count += 1
-    
-    conn.commit()
-    conn.close()
-    print(f"Synchronization complete. {count} new records are inserted into the local DB.")
+                data.get('user_id'),
+                data.get('priority'),
+                updated_at
+            )
+            if current is None:
+                cursor.execute(f'''
+                    INSERT INTO notes ({NOTE_INSERT_COLUMNS})
+                    VALUES ({NOTE_INSERT_PLACEHOLDERS})
+                ''', (note.id,) + row)
+                stats["inserted"] += 1
+                changes.append(('added', note.id))
+            elif tuple(current[field] for field in NOTE_FIELDS) != row:
+                cursor.execute(f'''
+                    UPDATE notes SET {", ".join(f"{field} = ?" for field in NOTE_FIELDS)}
+                    WHERE id = ?
+                ''', row + (note.id,))
+                stats["updated"] += 1
+                changes.append(('updated', note.id))
+
+        for note_id in removed_ids:
+            if note_id in pending_ids or note_id in seen_ids:
+                continue
+            if cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,)).rowcount:
+                stats["deleted"] += 1
+                changes.append(('deleted', note_id))
+
+        if full_sync:
+            stale_ids = [(note_id,) for note_id in existing
+                         if note_id not in seen_ids and note_id not in pending_ids
+                         and note_id not in removed_ids]
+            cursor.executemany("DELETE FROM notes WHERE id = ?", stale_ids)
+            stats["deleted"] += len(stale_ids)
+            changes.extend(('deleted', note_id) for (note_id,) in stale_ids)
+
+        if user_id is not None and watermark is not None:
+            cursor.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (_watermark_key(user_id), str(watermark))
+            )
+
+    _notify_notes_listeners(changes)
+    print(f"Synchronization complete. {stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['deleted']} deleted in the local DB.")
+    return stats
+
+def upsert_remote_notes(notes):
+    # Applies (note_id, data) pairs that already exist in Firestore, e.g. handed over by
+    # the Telegram bot, without a sync round-trip. Nothing is queued in the outbox, and
+    # notes with local edits still waiting to be pushed are left alone.
+    conn = get_db_connection()
+    changes = []
+    with conn:
+        pending_ids = {row['note_id'] for row in conn.execute("SELECT DISTINCT note_id FROM outbox")}
+        for note_id, data in notes:
+            if note_id in pending_ids:
+                continue
+            values = {field: data.get(field) for field in NOTE_FIELDS}
+            values['status'] = values['status'] or 'pending'
+            values['updated_at'] = _to_epoch(values['updated_at']) or time.time()
+            exists = conn.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+            conn.execute(f'''
+                INSERT INTO notes ({NOTE_INSERT_COLUMNS})
+                VALUES ({NOTE_INSERT_PLACEHOLDERS})
+                ON CONFLICT (id) DO UPDATE SET {", ".join(f"{field} = excluded.{field}" for field in NOTE_FIELDS)}
+            ''', (note_id,) + tuple(values[field] for field in NOTE_FIELDS))
+            changes.append(('updated' if exists else 'added', note_id))
+    _notify_notes_listeners(changes)
+    return changes
 
 def get_all_local_notes():
     conn = get_db_connection()
     notes = conn.execute("SELECT * FROM notes ORDER BY deadline_timestamp ASC").fetchall()
-    conn.close()
     return notes
 
-def get_notes_for_notification():
+NOTE_COLUMNS = ('id',) + NOTE_FIELDS
+
+def query_local_notes(status=None, mata_kuliah=None, deadline_from=None, deadline_to=None,
+                      after=None, limit=None, columns=None):
+    # Filtered page of notes in (deadline_timestamp, id) order. `after` is the
+    # (deadline_timestamp, id) of the last row of the previous page.
+    columns = [c for c in (columns or NOTE_COLUMNS) if c in NOTE_COLUMNS]
+    for required in ('deadline_timestamp', 'id'):
+        if required not in columns:
+            columns.append(required)
+    clauses, params = [], []
+    if status:
+        # One status is read in order from idx_notes_status_deadline_id. For several,
+        # the unary + keeps SQLite on idx_notes_deadline_id and filtering, instead of
+        # collecting every matching row into a temp B-tree to sort before the LIMIT.
+        column = "status" if len(status) == 1 else "+status"
+        clauses.append(f"{column} IN ({', '.join('?' * len(status))})")
+        params.extend(status)
+    if mata_kuliah:
+        clauses.append("mata_kuliah = ?")
+        params.append(mata_kuliah)
+    if deadline_from is not None:
+        clauses.append("deadline_timestamp >= ?")
+        params.append(deadline_from)
+    if deadline_to is not None:
+        clauses.append("deadline_timestamp <= ?")
+        params.append(deadline_to)
+    if after is not None:
+        clauses.append("(deadline_timestamp, id) > (?, ?)")
+        params.extend(after)
+    sql = f"SELECT {', '.join(columns)} FROM notes"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY deadline_timestamp, id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
     conn = get_db_connection()
-    now_utc = datetime.now(timezone.utc) 
-    now_ts = now_utc.timestamp()
-    tomorrow_ts = (now_utc + timedelta(days=1)).timestamp()
-    notes_to_notify = conn.execute(
-        "SELECT * FROM notes WHERE deadline_timestamp BETWEEN ? AND ? AND status = 'pending'",
-        (now_ts, tomorrow_ts)
-    ).fetchall()
-    conn.close()
-    return notes_to_notify
+    return conn.execute(sql, params).fetchall()
+
+def get_local_notes_by_ids(note_ids):
+    conn = get_db_connection()
+    note_ids = list(note_ids)
+    notes = []
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        notes.extend(conn.execute(f"SELECT * FROM notes WHERE id IN ({placeholders})", chunk).fetchall())
+    return notes
+
+# Both local mutations below queue the matching Firestore write in the same transaction.
 
 def update_note_status(note_id, new_status):
+    # Returns False when there was no such note; nothing is queued or announced then.
     conn = get_db_connection()
-    conn.execute("UPDATE notes SET status = ? WHERE id = ?", (new_status, note_id))
-    conn.commit()
-    conn.close()
-    print(f"Updated status for note {note_id} to {new_status}")
+    with conn:
+        updated = conn.execute("UPDATE notes SET status = ?, updated_at = ? WHERE id = ?",
+                               (new_status, time.time(), note_id)).rowcount > 0
+        if updated:
+            _enqueue_outbox(conn, 'update', note_id, {'status': new_status})
+    if updated:
+        _notify_notes_listeners([('updated', note_id)])
+        print(f"Updated status for note {note_id} to {new_status}")
+    return updated
 
 def delete_note_from_local_db(note_id):
+    # Returns False when there was no such note; nothing is queued then.
+    conn = get_db_connection()
+    with conn:
+        deleted = conn.execute("DELETE FROM notes WHERE id = ?", (note_id,)).rowcount > 0
+        if deleted:
+            conn.execute("DELETE FROM note_reminders WHERE note_id = ?", (note_id,))
+            _enqueue_outbox(conn, 'delete', note_id)
+    if deleted:
+        _notify_notes_listeners([('deleted', note_id)])
+        print(f"Deleted note {note_id} from local DB.")
+    return deleted
+
+# ================= REMINDER FUNCTIONS =================
+
+def get_notes_for_reminders(now_ts, note_ids=None):
+    # Open notes with a future deadline, plus the reminder offsets already sent for
+    # each note's current deadline. Read in full when the scheduler builds its heap;
+    # with `note_ids`, only those notes (the scheduler's update after a change).
+    conn = get_db_connection()
+    if note_ids is None:
+        filters = [("", "", [])]
+    else:
+        note_ids = list(note_ids)
+        filters = []
+        for start in range(0, len(note_ids), 500):
+            chunk = note_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            filters.append((f" AND id IN ({placeholders})", f" AND note_id IN ({placeholders})", chunk))
+    notes, sent = [], set()
+    for note_filter, reminder_filter, params in filters:
+        notes.extend(conn.execute(
+            f"SELECT * FROM notes WHERE deadline_timestamp > ? AND status IN ('pending', 'notified'){note_filter}",
+            [now_ts, *params]
+        ).fetchall())
+        for row in conn.execute(
+            "SELECT note_id, offset_seconds, deadline_timestamp FROM note_reminders "
+            f"WHERE deadline_timestamp > ?{reminder_filter}",
+            [now_ts, *params]
+        ):
+            sent.add((row['note_id'], row['offset_seconds'], row['deadline_timestamp']))
+    return notes, sent
+
+def record_reminders_sent(reminders):
+    # reminders: iterable of (note_id, deadline_timestamp, offsets). All bookkeeping for
+    # one notifier dispatch is written in a single transaction.
+    reminders = list(reminders)
+    if not reminders:
+        return
+    conn = get_db_connection()
+    sent_at = int(datetime.now().timestamp())
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO note_reminders (note_id, offset_seconds, deadline_timestamp, sent_at) VALUES (?, ?, ?, ?)",
+            [(note_id, offset, deadline_timestamp, sent_at)
+             for note_id, deadline_timestamp, offsets in reminders for offset in offsets]
+        )
+        conn.executemany(
+            "UPDATE notes SET status = 'notified' WHERE id = ? AND status = 'pending'",
+            [(note_id,) for note_id, _, _ in reminders]
+        )
+    _notify_notes_listeners([('updated', note_id) for note_id, _, _ in reminders])
+
+# ================= LOCAL-FIRST WRITES & OUTBOX =================
+
+def _enqueue_outbox(conn, op, note_id, payload=None):
+    _enqueue_outbox_many(conn, [(op, note_id, payload)])
+
+def _enqueue_outbox_many(conn, operations):
+    now = time.time()
+    conn.executemany(
+        "INSERT INTO outbox (op, note_id, payload, created_at) VALUES (?, ?, ?, ?)",
+        [(op, note_id, json.dumps(payload) if payload is not None else None, now)
+         for op, note_id, payload in operations]
+    )
+
+def create_local_note(note_id, data):
+    # Inserts the note and queues its Firestore write in one transaction. Returns False
+    # when a note with this id already exists (a retried request with the same id).
+    conn = get_db_connection()
+    values = {field: data.get(field) for field in NOTE_FIELDS}
+    values['status'] = values['status'] or 'pending'
+    values['updated_at'] = time.time()
+    with conn:
+        cursor = conn.execute(f'''
+            INSERT OR IGNORE INTO notes ({NOTE_INSERT_COLUMNS})
+            VALUES ({NOTE_INSERT_PLACEHOLDERS})
+        ''', (note_id,) + tuple(values[field] for field in NOTE_FIELDS))
+        created = cursor.rowcount == 1
+        if created:
+            remote = {k: v for k, v in values.items() if k != 'updated_at'}
+            _enqueue_outbox(conn, 'set', note_id, remote)
+    if created:
+        _notify_notes_listeners([('added', note_id)])
+    return created
+
+def update_local_note_fields(note_id, data):
+    conn = get_db_connection()
+    fields = [field for field in data if field in NOTE_FIELDS and field != 'updated_at']
+    with conn:
+        cursor = conn.execute(
+            f"UPDATE notes SET {', '.join(f'{field} = ?' for field in fields)}, updated_at = ? WHERE id = ?",
+            tuple(data[field] for field in fields) + (time.time(), note_id)
+        )
+        updated = cursor.rowcount == 1
+        if updated:
+            _enqueue_outbox(conn, 'update', note_id, {field: data[field] for field in fields})
+    if updated:
+        _notify_notes_listeners([('updated', note_id)])
+    return updated
+
+def get_due_outbox(now_ts, limit=100):
+    conn = get_db_connection()
+    return conn.execute(DUE_OUTBOX_SQL, (now_ts, limit)).fetchall()
+
+def get_outbox_entries_for_notes(note_ids):
+    conn = get_db_connection()
+    note_ids = list(note_ids)
+    entries = []
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        entries.extend(conn.execute(
+            f"SELECT * FROM outbox WHERE note_id IN ({placeholders}) ORDER BY note_id, id", chunk
+        ).fetchall())
+    return entries
+
+def get_outbox_stats():
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT COUNT(*) AS depth,
+               COUNT(DISTINCT note_id) AS notes,
+               SUM(CASE WHEN attempts > 0 THEN 1 ELSE 0 END) AS retrying,
+               MIN(created_at) AS oldest_created_at
+        FROM outbox
+    ''').fetchone()
+    failed = conn.execute("SELECT COUNT(*) FROM outbox_failed").fetchone()[0]
+    oldest = row['oldest_created_at']
+    return {
+        "depth": row['depth'],
+        "notes": row['notes'],
+        "retrying": row['retrying'] or 0,
+        "failed": failed,
+        "oldest_age_seconds": round(time.time() - oldest, 1) if oldest else 0,
+    }
+
+def get_next_outbox_attempt():
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT MIN(next_attempt_at) AS next_at FROM outbox AS o "
+        "WHERE NOT EXISTS (SELECT 1 FROM outbox AS p WHERE p.note_id = o.note_id AND p.id < o.id)"
+    ).fetchone()
+    return row['next_at']
+
+def complete_outbox(entry_ids):
+    conn = get_db_connection()
+    with conn:
+        conn.executemany("DELETE FROM outbox WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+def fail_outbox(failures):
+    # failures: iterable of (entry_id, error, next_attempt_at)
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+            [(str(error), next_attempt_at, entry_id) for entry_id, error, next_attempt_at in failures]
+        )
+
+def park_outbox(entry_ids, error):
+    # Moves entries that will not be retried to outbox_failed, in one transaction.
+    conn = get_db_connection()
+    now = time.time()
+    with conn:
+        for entry_id in entry_ids:
+            conn.execute('''
+                INSERT OR REPLACE INTO outbox_failed
+                    (id, op, note_id, payload, attempts, last_error, created_at, failed_at)
+                SELECT id, op, note_id, payload, attempts + 1, ?, created_at, ?
+                FROM outbox WHERE id = ?
+            ''', (str(error), now, entry_id))
+            conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+def get_failed_outbox(limit=100):
+    conn = get_db_connection()
+    return conn.execute("SELECT * FROM outbox_failed ORDER BY failed_at DESC, id DESC LIMIT ?", (limit,)).fetchall()
+
+# ================= BULK OPERATIONS =================
+# Each applies every item in one transaction, queues the remote writes for the outbox
+# worker to push as Firestore batches, and returns a per-id result.
+
+def bulk_create_local_notes(notes):
+    # notes: list of (note_id, data)
+    conn = get_db_connection()
+    now = time.time()
+    results, operations = {}, []
+    with conn:
+        for note_id, data in notes:
+            values = {field: data.get(field) for field in NOTE_FIELDS}
+            values['status'] = values['status'] or 'pending'
+            values['updated_at'] = now
+            cursor = conn.execute(f'''
+                INSERT OR IGNORE INTO notes ({NOTE_INSERT_COLUMNS})
+                VALUES ({NOTE_INSERT_PLACEHOLDERS})
+            ''', (note_id,) + tuple(values[field] for field in NOTE_FIELDS))
+            if cursor.rowcount == 1:
+                results[note_id] = 'created'
+                operations.append(('set', note_id, {k: v for k, v in values.items() if k != 'updated_at'}))
+            else:
+                results[note_id] = 'exists'
+        _enqueue_outbox_many(conn, operations)
+    _notify_notes_listeners([('added', note_id) for _, note_id, _ in operations])
+    return results
+
+def bulk_update_note_status(note_ids, new_status):
+    conn = get_db_connection()
+    now = time.time()
+    results, operations = {}, []
+    with conn:
+        for note_id in note_ids:
+            cursor = conn.execute("UPDATE notes SET status = ?, updated_at = ? WHERE id = ?",
+                                  (new_status, now, note_id))
+            if cursor.rowcount:
+                results[note_id] = 'updated'
+                operations.append(('update', note_id, {'status': new_status}))
+            else:
+                results[note_id] = 'not_found'
+        _enqueue_outbox_many(conn, operations)
+    _notify_notes_listeners([('updated', note_id) for _, note_id, _ in operations])
+    return results
+
+def bulk_delete_notes(note_ids):
     conn = get_db_connection()
-    conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-    conn.commit()
-    conn.close()
-    print(f"Deleted note {note_id} from local DB.")
\ No newline at end of file
+    results, operations = {}, []
+    with conn:
+        for note_id in note_ids:
+            cursor = conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            if cursor.rowcount:
+                conn.execute("DELETE FROM note_reminders WHERE note_id = ?", (note_id,))
+                results[note_id] = 'deleted'
+                operations.append(('delete', note_id, None))
+            else:
+                results[note_id] = 'not_found'
+        _enqueue_outbox_many(conn, operations)
+    _notify_notes_listeners([('deleted', note_id) for _, note_id, _ in operations])
+    return results
+
+# ================= FULL-TEXT SEARCH =================
+
+# snippet() wraps matches in these control characters; the API escapes the text and
+# turns them into <mark> tags, so stored content can never inject markup.
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+_FTS_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def build_fts_query(text):
+    # Each word becomes a quoted prefix term ("kalk"* matches "kalkulus"), ANDed together.
+    # Quoting keeps FTS5 operators and punctuation in user input from being parsed.
+    terms = _FTS_TOKEN_RE.findall(text)
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+def search_notes(text, limit=20):
+    query = build_fts_query(text)
+    if query is None:
+        return []
+    conn = get_db_connection()
+    # bm25 weights: a match in the course name counts more than one in the description.
+    return conn.execute(
+        f"""
+        SELECT n.id, n.mata_kuliah, n.deskripsi_tugas, n.tanggal_deadline_str, n.status,
+               snippet(notes_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 12) AS snippet,
+               bm25(notes_fts, 5.0, 1.0) AS rank
+        FROM notes_fts JOIN notes AS n ON n.rowid = notes_fts.rowid
+        WHERE notes_fts MATCH ?
+        ORDER BY rank LIMIT ?
+        """,
+        (query, limit)
+    ).fetchall()
+
+def search_chat_messages(text, limit=20):
+    query = build_fts_query(text)
+    if query is None:
+        return []
+    conn = get_db_connection()
+    return conn.execute(
+        f"""
+        SELECT m.id, m.session_id, m.sender, m.timestamp, s.title AS session_title,
+               snippet(chat_messages_fts, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet,
+               bm25(chat_messages_fts) AS rank
+        FROM chat_messages_fts
+        JOIN chat_messages AS m ON m.id = chat_messages_fts.rowid
+        LEFT JOIN chat_sessions AS s ON s.id = m.session_id
+        WHERE chat_messages_fts MATCH ?
+        ORDER BY rank LIMIT ?
+        """,
+        (query, limit)
+    ).fetchall()
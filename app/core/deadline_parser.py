@@ -0,0 +1,140 @@
+# File: app/core/deadline_parser.py
+
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+TIMEZONE = 'Asia/Jakarta'
+LANGUAGES = ['id', 'en']
+DATEPARSER_SETTINGS = {'PREFER_DATES_FROM': 'future', 'TIMEZONE': TIMEZONE}
+CACHE_SIZE = 512
+
+# Results are naive datetimes in Jakarta wall-clock time, the same as
+# dateparser.parse(..., settings={'TIMEZONE': 'Asia/Jakarta'}) returns.
+_TZ = ZoneInfo(TIMEZONE)
+
+_TIME = r'(?:\s+(?:jam|pukul|at|@)?\s*(?P<hour>\d{1,2})[:.](?P<minute>\d{2}))?'
+_ISO_RE = re.compile(r'^(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})(?:[ t](?P<hour>\d{1,2}):(?P<minute>\d{2}))?$')
+_DMY_RE = re.compile(r'^(?P<day>\d{1,2})[/-](?P<month>\d{1,2})[/-](?P<year>\d{4})' + _TIME + '$')
+_RELATIVE_DAYS = {
+    'hari ini': 0, 'today': 0,
+    'besok': 1, 'tomorrow': 1,
+    'lusa': 2,
+    'minggu depan': 7, 'next week': 7,
+}
+_RELATIVE_RE = re.compile(
+    r'^(?P<word>' + '|'.join(sorted(map(re.escape, _RELATIVE_DAYS), key=len, reverse=True)) + ')' + _TIME + '$'
+)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"fast": 0, "hits": 0, "misses": 0}
+_parser = None
+_parser_lock = threading.Lock()
+
+def _now():
+    return datetime.now(_TZ).replace(tzinfo=None)
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+def _with_time(day, match):
+    if match.group('hour') is None:
+        return day
+    return day.replace(hour=int(match.group('hour')), minute=int(match.group('minute')), second=0, microsecond=0)
+
+def _parse_fast(text, now):
+    # Common formats handled without dateparser. Returns None when no pattern applies.
+    try:
+        match = _ISO_RE.match(text) or _DMY_RE.match(text)
+        if match:
+            day = datetime(int(match.group('year')), int(match.group('month')), int(match.group('day')))
+            return _with_time(day, match)
+        match = _RELATIVE_RE.match(text)
+        if match:
+            return _with_time(now + timedelta(days=_RELATIVE_DAYS[match.group('word')]), match)
+    except ValueError:
+        pass  # e.g. 31/02/2025 or 25:00; let dateparser have a go
+    return None
+
+def get_dateparser():
+    # Built once and restricted to Indonesian/English, which skips language detection
+    # across dateparser's full locale set on every call.
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                from dateparser.date import DateDataParser
+                _parser = DateDataParser(languages=LANGUAGES, settings=DATEPARSER_SETTINGS)
+    return _parser
+
+def _parse_with_dateparser(text, relative_base=None):
+    if relative_base is None:
+        return get_dateparser().get_date_data(text).date_obj
+    import dateparser
+    return dateparser.parse(text, languages=LANGUAGES,
+                            settings={**DATEPARSER_SETTINGS, 'RELATIVE_BASE': relative_base})
+
+def _classify(text, now, result):
+    # Re-parses against a shifted base to learn how the result depends on "now":
+    # an absolute date stays put, a relative one moves by the same shift.
+    probe_base = now - timedelta(hours=1, minutes=7)
+    probe = _parse_with_dateparser(text, probe_base)
+    if probe == result:
+        return ('abs', result)
+    if probe is not None and abs((result - now) - (probe - probe_base)) < timedelta(seconds=1):
+        return ('rel', result - now)
+    return None  # depends on now in some other way (weekdays etc.); not cacheable
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+def _cache_put(key, entry):
+    with _cache_lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def parse_deadline(text):
+    if not text or not text.strip():
+        return None
+    now = _now()
+    normalized = normalize(text)
+
+    result = _parse_fast(normalized, now)
+    if result is not None:
+        _stats["fast"] += 1
+        return result
+
+    # Weekday and relative phrases resolve differently from one day to the next.
+    key = (normalized, now.date())
+    entry = _cache_get(key)
+    if entry is not None:
+        _stats["hits"] += 1
+        kind, value = entry
+        return value if kind == 'abs' else now + value
+
+    _stats["misses"] += 1
+    result = _parse_with_dateparser(text)
+    if result is None:
+        _cache_put(key, ('abs', None))
+        return None
+    entry = _classify(text, now, result)
+    if entry is not None:
+        _cache_put(key, entry)
+    return result
+
+def cache_info():
+    with _cache_lock:
+        return {**_stats, "size": len(_cache), "max_size": CACHE_SIZE}
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
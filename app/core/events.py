@@ -0,0 +1,39 @@
+# File: app/core/events.py
+
+import threading
+import time
+from collections import deque
+
+class NoteEventLog:
+    # Bounded history of note change events. Every event gets the next revision
+    # number so clients can detect gaps and replay from the last one they applied.
+
+    def __init__(self, capacity=1000):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=capacity)
+        self.revision = 0
+        self.last_modified = time.time()
+        # Revisions restart with the process, so cache validators include this run id.
+        self.instance_id = format(int(self.last_modified * 1000), 'x')
+
+    def append(self, event, payload):
+        with self._lock:
+            self.revision += 1
+            self.last_modified = time.time()
+            record = {"revision": self.revision, "event": event, **payload}
+            self._events.append(record)
+            return record
+
+    def since(self, revision):
+        # Events newer than `revision`, or None when they have already been evicted
+        # (or the revision is from another server run) and a full snapshot is needed.
+        with self._lock:
+            if revision > self.revision:
+                return None
+            if revision == self.revision:
+                return []
+            if not self._events or self._events[0]["revision"] > revision + 1:
+                return None
+            return [e for e in self._events if e["revision"] > revision]
+
+note_events = NoteEventLog()
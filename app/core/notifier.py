@@ -1,48 +1,213 @@
 # File: app/core/notifier.py
 
+import heapq
+import itertools
+import threading
 import time
+from collections import deque
 from datetime import datetime
-from plyer import notification
-from .database import get_notes_for_notification, update_note_status
+from app.config import REMINDER_OFFSETS, NOTIFIER_BATCH_MODE, NOTIFIER_MAX_PER_MINUTE
+from .database import add_notes_listener, get_notes_for_reminders, record_reminders_sent
 
-def run_notifier_check():
-    print("[Notifier] The notification thread starts.")
-    while True:
-        try:
-            print(f"[{datetime.now()}] [Notifier] Checking deadlines...")
-            
-            notes_to_notify = get_notes_for_notification()
-            
-            print(f"[Notifier] Found {len(notes_to_notify)} notes to be notified.")
-            
-            if not notes_to_notify:
-                print("[Notifier] There is no deadline in the next 24 hours.")
+def format_time_left(seconds):
+    minutes = max(0, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours} hour(s) {minutes} minute(s)"
+    if hours:
+        return f"{hours} hour(s)"
+    return f"{minutes} minute(s)"
+
+class DeadlineScheduler:
+    # Min-heap of (fire_at, seq, reminder) entries built from the notes table once at
+    # start. After that, notes listener changes only re-read the notes they name and
+    # replace those notes' entries; between changes the thread sleeps on the condition
+    # variable until the earliest reminder is due.
+
+    def __init__(self, offsets=REMINDER_OFFSETS, batch_mode=NOTIFIER_BATCH_MODE,
+                 max_per_minute=NOTIFIER_MAX_PER_MINUTE):
+        self.offsets = sorted(offsets, reverse=True)
+        self.batch_mode = batch_mode
+        self.max_per_minute = max_per_minute
+        self._sent_times = deque()
+        self._condition = threading.Condition()
+        self._dirty = True
+        self._changed_ids = set()
+        self._dispatching = threading.local()
+        self._heap = []
+        self._seq = itertools.count()
+
+    def notify_changed(self, changes=None):
+        # changes: [(kind, note_id), ...] from the notes listener, or None to rebuild.
+        if getattr(self._dispatching, 'active', False):
+            return  # the notes this thread just marked as reminded; their entries are gone
+        with self._condition:
+            if changes is None:
+                self._dirty = True
             else:
-                for note in notes_to_notify:
-                    note_id = note['id']
-                    print(f"[Notifier] Trying to send notification for note ID: {note_id}")
-                    title = f"Deadline Reminder: {note['mata_kuliah']}"
-                    message = f"Task '{note['deskripsi_tugas']}' due on {note['tanggal_deadline_str']}"
-                    
-                    try:
-                        notification.notify(
-                            title=title,
-                            message=message,
-                            app_name="Aplikasi Note Tugas",
-                            app_icon='assets/icon.ico', 
-                            timeout=20
-                        )
-                        print(f"[Notifier] Notifications for {note_id} SUCCESSFULLY displayed.")
-                        
-                        update_note_status(note_id, 'notified')
-                        print(f"[Notifier] Status for {note_id} successfully changed to 'notified'.")
-
-                    except Exception as e:
-                        print(f"[Notifier] FAILED to display notification for {note_id}. Error: {e}")
-
-            print("[Notifier] Waiting 1 Hour before next check...")
-            time.sleep(3600) 
-
-        except Exception as e:
-            print(f"[Notifier] A major error occurred in the notifier thread: {e}")
-            time.sleep(300)
\ No newline at end of file
+                self._changed_ids.update(note_id for _, note_id in changes)
+            self._condition.notify()
+
+    def _entries(self, notes, sent, now):
+        entries = []
+        for note in notes:
+            deadline = note['deadline_timestamp']
+            pending = [o for o in self.offsets if (note['id'], o, deadline) not in sent]
+            # Reminders whose time already passed (app was closed, note added late)
+            # collapse into a single reminder sent right away.
+            missed = [o for o in pending if deadline - o <= now]
+            if missed:
+                entries.append((now, next(self._seq), self._reminder(note, missed)))
+            for offset in pending:
+                if deadline - offset > now:
+                    entries.append((deadline - offset, next(self._seq), self._reminder(note, [offset])))
+        return entries
+
+    def _rebuild(self):
+        now = time.time()
+        notes, sent = get_notes_for_reminders(now)
+        heap = self._entries(notes, sent, now)
+        heapq.heapify(heap)
+        self._heap = heap
+        if heap:
+            print(f"[Notifier] {len(heap)} reminders scheduled, next at {datetime.fromtimestamp(heap[0][0])}.")
+        else:
+            print("[Notifier] There are no upcoming reminders.")
+
+    def _update(self, note_ids):
+        # Replaces the entries of the changed notes only; deleted or finished notes and
+        # past deadlines are simply not read back.
+        now = time.time()
+        notes, sent = get_notes_for_reminders(now, note_ids)
+        heap = [entry for entry in self._heap if entry[2]['id'] not in note_ids]
+        heap.extend(self._entries(notes, sent, now))
+        heapq.heapify(heap)
+        self._heap = heap
+
+    def _reminder(self, note, offsets):
+        return {
+            "id": note['id'],
+            "mata_kuliah": note['mata_kuliah'],
+            "deskripsi_tugas": note['deskripsi_tugas'],
+            "tanggal_deadline_str": note['tanggal_deadline_str'],
+            "deadline_iso_str": note['deadline_iso_str'],
+            "deadline_timestamp": note['deadline_timestamp'],
+            "offsets": offsets,
+        }
+
+    def _wait_for_work(self):
+        # Returns (rebuild, changed note ids); both empty when a reminder is due.
+        with self._condition:
+            while not self._dirty and not self._changed_ids:
+                if self._heap:
+                    timeout = self._heap[0][0] - time.time()
+                    if timeout <= 0:
+                        break
+                else:
+                    timeout = None
+                self._condition.wait(timeout)
+            rebuild, changed = self._dirty, self._changed_ids
+            self._dirty, self._changed_ids = False, set()
+        return rebuild, changed
+
+    def _pop_due(self):
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def _group(self, reminders):
+        if self.batch_mode == "day":
+            key = lambda r: r['deadline_iso_str'] or r['tanggal_deadline_str']
+        elif self.batch_mode == "course":
+            key = lambda r: r['mata_kuliah']
+        else:
+            return [[r] for r in reminders]
+        groups = {}
+        for reminder in reminders:
+            groups.setdefault(key(reminder), []).append(reminder)
+        return list(groups.values())
+
+    def _acquire_slot(self):
+        # Sliding one-minute window; returns the time the next slot frees up when full.
+        now = time.time()
+        while self._sent_times and self._sent_times[0] <= now - 60:
+            self._sent_times.popleft()
+        if self.max_per_minute and len(self._sent_times) >= self.max_per_minute:
+            return self._sent_times[0] + 60
+        self._sent_times.append(now)
+        return None
+
+    def _format(self, group, now):
+        first = group[0]
+        if len(group) == 1:
+            # From the deadline, not the offsets: a reminder that fired late, or several
+            # offsets merged into one, would otherwise state the wrong time left.
+            title = f"Deadline Reminder: {first['mata_kuliah']}"
+            message = (f"Task '{first['deskripsi_tugas']}' due on {first['tanggal_deadline_str']} "
+                       f"(in {format_time_left(first['deadline_timestamp'] - now)})")
+        elif self.batch_mode == "course":
+            title = f"Deadline Reminder: {first['mata_kuliah']} ({len(group)} tasks)"
+            message = "; ".join(f"'{r['deskripsi_tugas']}' due {r['tanggal_deadline_str']}" for r in group)
+        else:
+            title = f"Deadline Reminder: {len(group)} tasks due {first['deadline_iso_str']}"
+            message = "; ".join(f"{r['mata_kuliah']}: '{r['deskripsi_tugas']}'" for r in group)
+        return title, message
+
+    def _dispatch(self, reminders):
+        from plyer import notification
+        delivered = []
+        for group in self._group(reminders):
+            retry_at = self._acquire_slot()
+            if retry_at is not None:
+                for reminder in group:
+                    heapq.heappush(self._heap, (retry_at, next(self._seq), reminder))
+                continue
+            note_ids = ", ".join(r['id'] for r in group)
+            print(f"[Notifier] Trying to send notification for note ID: {note_ids}")
+            title, message = self._format(group, time.time())
+            try:
+                notification.notify(
+                    title=title,
+                    message=message,
+                    app_name="Aplikasi Note Tugas",
+                    app_icon='assets/icon.ico',
+                    timeout=20
+                )
+                print(f"[Notifier] Notifications for {note_ids} SUCCESSFULLY displayed.")
+                delivered.extend((r['id'], r['deadline_timestamp'], r['offsets']) for r in group)
+            except Exception as e:
+                print(f"[Notifier] FAILED to display notification for {note_ids}. Error: {e}")
+        if delivered:
+            self._dispatching.active = True
+            try:
+                record_reminders_sent(delivered)
+            finally:
+                self._dispatching.active = False
+            print(f"[Notifier] Status for {len(delivered)} notes successfully changed to 'notified'.")
+
+    def run(self):
+        print("[Notifier] The notification thread starts.")
+        while True:
+            try:
+                rebuild, changed = self._wait_for_work()
+                if rebuild:
+                    self._rebuild()
+                    continue
+                if changed:
+                    self._update(changed)
+                    continue
+                due = self._pop_due()
+                if due:
+                    self._dispatch(due)
+            except Exception as e:
+                print(f"[Notifier] A major error occurred in the notifier thread: {e}")
+                time.sleep(60)
+                self.notify_changed()
+
+deadline_scheduler = DeadlineScheduler()
+
+def run_notifier_check():
+    add_notes_listener(deadline_scheduler.notify_changed)
+    deadline_scheduler.run()
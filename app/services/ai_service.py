@@ -0,0 +1,159 @@
+# File: app/services/ai_service.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from app.config import (
+    GROQ_API_URL,
+    GROQ_MODEL,
+    AI_CONNECT_TIMEOUT,
+    AI_READ_TIMEOUT,
+    AI_CACHE_TTL,
+    AI_CACHE_MAX_ENTRIES
+)
+from app.core.chat_context import history_messages, message_tokens
+from app.core.database import (
+    get_cached_ai_response,
+    put_cached_ai_response,
+    get_ai_cache_size
+)
+from app.services.http_client import http_client
+
+SYSTEM_PROMPT = (
+    "You are 'Kanee', a smart and helpful AI assistant for a task management app. Your goal is to help users "
+    "with their tasks (homework, programming, etc.) in a clear, educational, and easy-to-understand way. \n\n"
+    "GUIDELINES:\n"
+    "1. **Math**: Use LaTeX formatting for math equations (e.g., $E=mc^2$). Explain the steps clearly before "
+    "showing the solution.\n"
+    "2. **Programming**: When providing code, ALWAYS explain how it works efficiently. Use comments in code. \n"
+    "3. **General**: Be friendly but professional. Use Markdown (bold, lists, headings) to make your answers "
+    "neat and readable. Avoid complex jargon unless you explain it."
+)
+
+_cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+_cache_stats_lock = threading.Lock()
+
+class AIServiceError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def get_api_key(settings):
+    # Set environment variable: GROQ_API_KEY=your_key_here, or add groq_api_key to settings.
+    api_key = (os.environ.get("GROQ_API_KEY") or settings.get("groq_api_key") or "").strip()
+    if not api_key:
+        raise AIServiceError("GROQ_API_KEY not set. Please set environment variable or add to settings.", 400)
+    return api_key
+
+def build_messages(prompt, context='', session_id=None):
+    full_prompt = f"""
+    Context (Tugas Saya):
+    {context}
+
+    Pertanyaan/Perintah Saya:
+    {prompt}
+
+    Tolong bantu saya dengan tugas ini. Jawab dengan format yang rapi dan mudah dibaca (gunakan Markdown).
+    """
+    system = {"role": "system", "content": SYSTEM_PROMPT}
+    question = {"role": "user", "content": full_prompt}
+    # Earlier turns of the session go between the system prompt and the new question,
+    # within whatever is left of the token budget.
+    reserved = message_tokens(system) + message_tokens(question)
+    return [system, *history_messages(session_id, reserved), question]
+
+def _post(api_key, messages, stream):
+    import requests
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {"messages": messages, "model": GROQ_MODEL, "stream": stream}
+    try:
+        response = http_client.post(GROQ_API_URL, headers=headers, json=payload, stream=stream,
+                                    timeout=(AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT))
+    except requests.RequestException as e:
+        raise AIServiceError(f"Groq Connection Error: {e}")
+    if response.status_code != 200:
+        print(f"Groq API Error: {response.text}")
+        try:
+            message = response.json().get('error', {}).get('message', 'Unknown error')
+        except ValueError:
+            message = 'Unknown error'
+        response.close()
+        raise AIServiceError(f"Groq Error: {message}")
+    return response
+
+def complete(api_key, messages):
+    response = _post(api_key, messages, stream=False)
+    try:
+        return response.json()['choices'][0]['message']['content']
+    except (ValueError, KeyError, IndexError) as e:
+        raise AIServiceError(f"Groq Error: unexpected response ({e})")
+
+def stream_completion(api_key, messages):
+    # Yields content deltas as the server produces them. The body is the OpenAI-style
+    # event stream: "data: {json chunk}" lines, terminated by "data: [DONE]".
+    response = _post(api_key, messages, stream=True)
+    try:
+        for line in response.iter_lines():
+            if not line or not line.startswith(b'data:'):
+                continue  # blank separators, comments and keep-alives
+            data = line[len(b'data:'):].strip()
+            if data == b'[DONE]':
+                return
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if chunk.get('error'):
+                raise AIServiceError(f"Groq Error: {chunk['error'].get('message', 'Unknown error')}")
+            for choice in chunk.get('choices', []):
+                text = (choice.get('delta') or {}).get('content')
+                if text:
+                    yield text
+    except AIServiceError:
+        raise
+    except Exception as e:
+        raise AIServiceError(f"Groq Connection Error: {e}")
+    finally:
+        response.close()
+
+# ================= RESPONSE CACHE =================
+
+def cache_key(messages):
+    # Everything the model sees: the model name, system prompt, session summary and
+    # history, task context and prompt. Follow-ups such as "contoh lain" only make sense
+    # with their history, so the same words after a different conversation must miss;
+    # a question that opens a session shares its key with one asked outside a session.
+    raw = json.dumps([GROQ_MODEL, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _count(name):
+    with _cache_stats_lock:
+        _cache_stats[name] += 1
+
+def get_cached(messages, no_cache=False):
+    # Returns a cached answer or None. `no_cache` skips the lookup (a fresh answer is
+    # still stored afterwards, replacing the old one).
+    if no_cache:
+        _count("bypassed")
+        return None
+    response = get_cached_ai_response(cache_key(messages), time.time(), AI_CACHE_TTL)
+    _count("misses" if response is None else "hits")
+    return response
+
+def store_cached(messages, response):
+    if response:
+        put_cached_ai_response(cache_key(messages), response, time.time(), AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL)
+
+def cache_stats():
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+    stats["entries"] = get_ai_cache_size()
+    stats["max_entries"] = AI_CACHE_MAX_ENTRIES
+    return stats
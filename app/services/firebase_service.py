@@ -1,47 +1,170 @@
 # File: app/services/firebase_service.py
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import threading
+from datetime import datetime, timezone
 from app.config import CRED_PATH
+from app.services.note_store import NoteStore, NoteNotFoundError, BATCH_LIMIT
+
+# firebase_admin pulls in gRPC and the Firestore client (hundreds of milliseconds), so
+# it is imported when the service is first used rather than when this module loads.
+firestore = None
+google_exceptions = None
+
+MISSING_INDEX_HINT = (
+    "Firestore needs the composite index on notes (user_id, updated_at) for delta sync. "
+    "Deploy it with `firebase deploy --only firestore:indexes` (see firestore.indexes.json "
+    "and the README). Until it exists and the app is restarted, every sync reads all of the "
+    "user's notes."
+)
+
+class FirebaseService(NoteStore):
+    # The Firestore implementation of NoteStore.
 
-class FirebaseService:
     def __init__(self):
+        self._db = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._missing_index = False
+        self._index_checked = False
+
+    @property
+    def db(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._db = self._connect()
+                    self._initialized = True
+        return self._db
+
+    def _connect(self):
+        global firestore, google_exceptions
+        import firebase_admin
+        from firebase_admin import credentials, firestore as firestore_module
+        from google.api_core import exceptions as exceptions_module
+        firestore = firestore_module
+        google_exceptions = exceptions_module
         if not firebase_admin._apps:
             try:
                 cred = credentials.Certificate(CRED_PATH)
                 firebase_admin.initialize_app(cred)
             except Exception as e:
                 print(f"Error initializing Firebase: {e}")
-                self.db = None
-                return
-        self.db = firestore.client()
+                return None
+        return firestore.client()
 
-    def get_notes_for_user(self, user_id):
-        if not self.db or not user_id: return []
+    def get_notes_for_user(self, user_id, since=None):
+        # Returns None when Firestore is unreachable so callers can tell
+        # "nothing changed" apart from "could not ask".
+        if not self.db or not user_id: return None
         try:
-            notes_filter = firestore.FieldFilter('user_id', '==', int(user_id))
-            notes_ref = self.db.collection('notes').where(filter=notes_filter).stream()
-            return notes_ref
+            try:
+                return list(self._notes_query(user_id, since).stream())
+            except google_exceptions.FailedPrecondition as e:
+                # Raised for a missing index; anything else is still an error below.
+                if since is None or not self._note_missing_index(e):
+                    raise
+                return list(self._notes_query(user_id).stream())
         except Exception as e:
             print(f"Error fetching notes from Firestore: {e}")
-            return []
+            return None
+
+    def _note_missing_index(self, error):
+        if 'index' not in str(error).lower():
+            return False
+        if not self._missing_index:
+            print(f"[Firestore] ERROR: {error}\n[Firestore] {MISSING_INDEX_HINT}")
+        self._missing_index = True
+        return True
+
+    def _notes_query(self, user_id, since=None):
+        query = self.db.collection('notes').where(filter=firestore.FieldFilter('user_id', '==', int(user_id)))
+        if since is not None and not self._missing_index:
+            since_dt = datetime.fromtimestamp(since, timezone.utc)
+            query = query.where(filter=firestore.FieldFilter('updated_at', '>', since_dt))
+        return query
+
+    def watch_notes(self, user_id, since, callback):
+        # Subscribes to the same query as get_notes_for_user(). callback(changes) runs on
+        # the listener's thread with a list of (type, snapshot) pairs, type being 'ADDED',
+        # 'MODIFIED' or 'REMOVED'; the first call holds every matching document. Returns
+        # the watch (unsubscribe(), is_active), or None when Firestore is unreachable.
+        if not self.db or not user_id: return None
+        def on_snapshot(docs, changes, read_time):
+            callback([(change.type.name, change.document) for change in changes])
+        try:
+            if since is not None and not self._index_checked:
+                # A listener on a query without its index only dies later on its own
+                # thread, so the index is checked once with a one-document read first.
+                try:
+                    list(self._notes_query(user_id, since).limit(1).stream())
+                except google_exceptions.FailedPrecondition as e:
+                    if not self._note_missing_index(e):
+                        raise
+                self._index_checked = True
+            return self._notes_query(user_id, since).on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"Error subscribing to Firestore notes: {e}")
+            return None
 
     def add_note(self, note_data, user_id):
         if not self.db or not user_id: return None
         try:
             note_data['user_id'] = int(user_id)
             note_data['created_at'] = firestore.SERVER_TIMESTAMP
+            note_data['updated_at'] = firestore.SERVER_TIMESTAMP
             update_time, doc_ref = self.db.collection('notes').add(note_data)
             return doc_ref
         except Exception as e:
             print(f"Error adding note to Firestore: {e}")
             return None
 
+    def set_note(self, note_id, note_data):
+        # Creates the document under a client-generated id, so a retried push
+        # overwrites instead of duplicating.
+        if not self.db: return None
+        try:
+            data = {**note_data, 'created_at': firestore.SERVER_TIMESTAMP, 'updated_at': firestore.SERVER_TIMESTAMP}
+            self.db.collection('notes').document(note_id).set(data)
+            print(f"Note {note_id} written to Firestore.")
+            return True
+        except Exception as e:
+            print(f"Error writing note to Firestore: {e}")
+            return False
+
+    def apply_batch(self, operations):
+        # operations: list of (op, note_id, payload) with op in 'set', 'update', 'delete'.
+        # Committed as Firestore batched writes of at most BATCH_LIMIT operations each.
+        if not self.db: return None
+        try:
+            for start in range(0, len(operations), BATCH_LIMIT):
+                batch = self.db.batch()
+                for op, note_id, payload in operations[start:start + BATCH_LIMIT]:
+                    doc_ref = self.db.collection('notes').document(note_id)
+                    if op == 'set':
+                        batch.set(doc_ref, {**payload, 'created_at': firestore.SERVER_TIMESTAMP,
+                                            'updated_at': firestore.SERVER_TIMESTAMP})
+                    elif op == 'update':
+                        batch.update(doc_ref, {**payload, 'updated_at': firestore.SERVER_TIMESTAMP})
+                    elif op == 'delete':
+                        batch.update(doc_ref, {'deleted': True, 'updated_at': firestore.SERVER_TIMESTAMP})
+                    else:
+                        raise ValueError(f"Unknown batch operation '{op}'")
+                batch.commit()
+            print(f"Committed {len(operations)} note operations to Firestore.")
+            return True
+        except google_exceptions.NotFound:
+            # An update or delete of a document that does not exist; only a batch of one
+            # tells which.
+            raise NoteNotFoundError(operations[0][1] if len(operations) == 1 else None)
+        except Exception as e:
+            print(f"Error committing batch to Firestore: {e}")
+            return False
+
     def update_note_status(self, note_id, new_status):
         if not self.db: return None
         try:
             doc_ref = self.db.collection('notes').document(note_id)
-            doc_ref.update({'status': new_status})
+            doc_ref.update({'status': new_status, 'updated_at': firestore.SERVER_TIMESTAMP})
             print(f"Note {note_id} status updated to '{new_status}' in Firestore.")
             return True
         except Exception as e:
@@ -51,7 +174,7 @@ class FirebaseService:
     def update_note_fields(self, note_id, data):
         if not self.db: return None
         try:
-            self.db.collection('notes').document(note_id).update(data)
+            self.db.collection('notes').document(note_id).update({**data, 'updated_at': firestore.SERVER_TIMESTAMP})
             print(f"Note {note_id} updated in Firestore.")
             return True
         except Exception as e:
@@ -61,7 +184,8 @@ class FirebaseService:
     def delete_note(self, note_id):
         if not self.db: return None
         try:
-            self.db.collection('notes').document(note_id).delete()
+            # Keep a tombstone so delta syncs on other devices see the delete.
+            self.db.collection('notes').document(note_id).update({'deleted': True, 'updated_at': firestore.SERVER_TIMESTAMP})
             print(f"Note {note_id} deleted from Firestore.")
             return True
         except Exception as e:
@@ -0,0 +1,206 @@
+# File: app/services/http_client.py
+
+import bisect
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from app.config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_MAX_PER_HOST,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    HTTP_RETRY_BACKOFF_MAX,
+    HTTP_RETRY_BUDGET_RATIO
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class RetryBudget:
+    # Token bucket shared by all hosts: every request deposits `ratio` tokens and every
+    # retry spends one, so a failing upstream sees at most ~20% extra traffic.
+
+    def __init__(self, ratio=HTTP_RETRY_BUDGET_RATIO, capacity=10):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th request (None for the open bucket).
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def snapshot(self):
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.total,
+            "errors": self.errors,
+            "mean_ms": round(self.sum / self.total * 1000, 1) if self.total else None,
+            "p50_le": self.quantile(0.5),
+            "p99_le": self.quantile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+def retry_after_seconds(response):
+    # Retry-After is either a number of seconds or an HTTP date.
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+class HttpClient:
+    # One requests.Session for all outbound calls, so connections to Groq and the local
+    # API are kept alive and reused. Every request has a timeout, 429/5xx responses and
+    # connection failures are retried with jittered backoff (honouring Retry-After), and
+    # a per-host semaphore caps concurrent requests.
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, max_per_host=HTTP_MAX_PER_HOST,
+                 max_retries=HTTP_MAX_RETRIES, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.retry_budget = RetryBudget()
+        self._session = None
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._histograms = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # requests is imported on first use to keep it off the startup path.
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                          max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slot
+
+    def _observe(self, host, seconds, error):
+        with self._stats_lock:
+            histogram = self._histograms.get(host)
+            if histogram is None:
+                histogram = self._histograms[host] = LatencyHistogram()
+            histogram.observe(seconds, error)
+
+    def _backoff(self, attempt, response=None):
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, HTTP_RETRY_BACKOFF_MAX)
+        delay = min(HTTP_RETRY_BACKOFF_MAX, HTTP_RETRY_BACKOFF * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        # Same arguments as requests.request. Raises requests.RequestException when the
+        # last attempt fails; a final 429/5xx response is returned to the caller.
+        import requests
+        host = urlsplit(url).netloc
+        retries = self.max_retries if retries is None else retries
+        timeout = self.timeout if timeout is None else timeout
+        slot = self._slot(host)
+        self.retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            response, error = None, None
+            started = time.perf_counter()
+            # For streamed responses the slot is held until the headers arrive, not
+            # for the whole body.
+            with slot:
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            self._observe(host, time.perf_counter() - started, failed)
+
+            # A read timeout may mean the server already acted on the request, so only
+            # idempotent methods are retried after one.
+            retryable = failed and not (
+                isinstance(error, requests.ReadTimeout) and method.upper() not in ('GET', 'HEAD', 'PUT', 'DELETE')
+            )
+            if not retryable or attempt >= retries or not self.retry_budget.withdraw():
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff(attempt, response)
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            print(f"[HTTP] {method} {host} failed ({reason}), retry {attempt + 1}/{retries} in {delay:.1f}s")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        with self._stats_lock:
+            return {host: histogram.snapshot() for host, histogram in self._histograms.items()}
+
+http_client = HttpClient()
@@ -0,0 +1,203 @@
+# File: app/services/local_ipc.py
+
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from app.config import IPC_INFO_FILE, IPC_TIMEOUT
+
+MAX_MESSAGE_BYTES = 1024 * 1024
+LISTEN_BACKLOG = 128  # pending connections; the bot publishes from a pool of worker threads
+CONNECT_RETRY_DELAY = 0.01  # seconds between connects while the backlog is full
+
+# Protocol: one JSON object per line in each direction.
+#   -> {"type": "notes_upsert", "token": "...", "notes": [{"id": "...", "data": {...}}, ...]}
+#   <- {"ok": true, "applied": 1} or {"ok": false, "error": "..."}
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.connection.settimeout(IPC_TIMEOUT * 5)
+        while True:
+            # Bounded read, so an endless line cannot grow the buffer past the limit.
+            line = self.rfile.readline(MAX_MESSAGE_BYTES + 1)
+            if not line:
+                return
+            if len(line) > MAX_MESSAGE_BYTES:
+                self._reply({"ok": False, "error": "message too large"})
+                return
+            if line.strip():
+                self._reply(self.server.ipc.dispatch(line))
+
+    def _reply(self, data):
+        self.wfile.write(json.dumps(data).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = LISTEN_BACKLOG
+
+class LocalIPC:
+    # Lets the Telegram bot hand notes it has just written to Firestore straight to the
+    # desktop app, instead of asking it for a sync round-trip. The app listens on a Unix
+    # socket (TCP on 127.0.0.1 where AF_UNIX is unavailable) and advertises the address
+    # and a per-run token in IPC_INFO_FILE. When the bot runs inside the app process
+    # (webhook mode), publish_notes() calls the handler directly.
+
+    def __init__(self, info_file=IPC_INFO_FILE):
+        self.info_file = info_file
+        self._handler = None
+        self._server = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def start(self, handler):
+        # handler(notes) receives a list of (note_id, data) pairs and returns how many it applied.
+        with self._lock:
+            self._handler = handler
+            if self._server is not None:
+                return
+            self._token = secrets.token_urlsafe(32)
+            try:
+                self._server, info = self._listen()
+            except OSError as e:
+                print(f"[IPC] Could not open the local IPC channel: {e}")
+                return
+            self._server.ipc = self
+            self._write_info({**info, "token": self._token, "pid": os.getpid()})
+            threading.Thread(target=self._server.serve_forever, name="local-ipc", daemon=True).start()
+        print(f"[IPC] Listening for the bot on {info['address']}.")
+
+    def _listen(self):
+        if hasattr(socket, 'AF_UNIX'):
+            path = os.path.join(tempfile.gettempdir(), f"notes-app-{os.getpid()}.sock")
+            if os.path.exists(path):
+                os.unlink(path)
+            server = _UnixServer(path, _RequestHandler)
+            os.chmod(path, 0o600)
+            return server, {"transport": "unix", "address": path}
+        server = _TCPServer(('127.0.0.1', 0), _RequestHandler)
+        return server, {"transport": "tcp", "address": f"127.0.0.1:{server.server_address[1]}"}
+
+    def _write_info(self, info):
+        directory = os.path.dirname(os.path.abspath(self.info_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.ipc-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(info, f)
+            os.replace(tmp_path, self.info_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def stop(self):
+        with self._lock:
+            server, self._server, self._handler = self._server, None, None
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        if isinstance(server, _UnixServer):
+            try:
+                os.unlink(server.server_address)
+            except FileNotFoundError:
+                pass
+        try:
+            os.unlink(self.info_file)
+        except FileNotFoundError:
+            pass
+
+    def dispatch(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "invalid JSON"}
+        if not isinstance(message, dict) or not hmac.compare_digest(
+                str(message.get("token", "")).encode(), (self._token or "").encode()):
+            return {"ok": False, "error": "unauthorized"}
+        if message.get("type") != "notes_upsert" or not isinstance(message.get("notes"), list):
+            return {"ok": False, "error": "unsupported message"}
+        handler = self._handler
+        if handler is None:
+            return {"ok": False, "error": "not ready"}
+        try:
+            notes = [(note["id"], note["data"]) for note in message["notes"]]
+            return {"ok": True, "applied": handler(notes)}
+        except Exception as e:
+            print(f"[IPC] Could not apply notes from the bot: {e}")
+            return {"ok": False, "error": str(e)}
+
+    # ---- client side (the bot) ----
+
+    def _read_info(self):
+        try:
+            with open(self.info_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _connect(self, info, timeout):
+        if info.get("transport") == "unix":
+            deadline = time.monotonic() + timeout
+            while True:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(timeout)
+                try:
+                    sock.connect(info["address"])
+                    return sock
+                except BlockingIOError:
+                    # EAGAIN: the listen backlog is full. A Unix socket connect with a
+                    # timeout fails at once instead of waiting for room, so retry here.
+                    sock.close()
+                    if time.monotonic() >= deadline:
+                        raise
+                    time.sleep(CONNECT_RETRY_DELAY)
+                except OSError:
+                    sock.close()
+                    raise
+        host, port = info["address"].rsplit(':', 1)
+        return socket.create_connection((host, int(port)), timeout=timeout)
+
+    def publish_notes(self, notes, timeout=IPC_TIMEOUT):
+        # notes: list of (note_id, data). Returns True once the app has applied them,
+        # False if it is not running or did not answer; the caller then falls back to a sync.
+        handler = self._handler
+        if handler is not None:
+            try:
+                handler(notes)
+                return True
+            except Exception as e:
+                print(f"[IPC] Could not apply notes in-process: {e}")
+                return False
+
+        info = self._read_info()
+        if not info:
+            return False
+        message = {"type": "notes_upsert", "token": info.get("token"),
+                   "notes": [{"id": note_id, "data": data} for note_id, data in notes]}
+        try:
+            with self._connect(info, timeout) as sock:
+                sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+                with sock.makefile('rb') as reader:
+                    reply = json.loads(reader.readline() or b'{}')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[IPC] Desktop app did not take the notes: {e}")
+            return False
+        if not reply.get("ok"):
+            print(f"[IPC] Desktop app rejected the notes: {reply.get('error')}")
+            return False
+        return True
+
+local_ipc = LocalIPC()
@@ -0,0 +1,285 @@
+# File: app/services/note_store.py
+
+import copy
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from app.config import LOCAL_STORE_PATH
+
+BATCH_LIMIT = 500  # Firestore's maximum number of writes per batch
+
+class NoteNotFoundError(Exception):
+    # Raised by apply_batch() when an update or delete targets a document that does not
+    # exist. Unlike other failures it is permanent, so retrying will not help.
+    def __init__(self, note_id=None):
+        super().__init__(f"No document to update: {note_id}" if note_id else "No document to update")
+        self.note_id = note_id
+
+class NoteStore(ABC):
+    # The remote side of sync: where the bot writes notes, the outbox worker pushes local
+    # edits and /api/sync and the realtime listener read from. Failures are reported,
+    # not raised: reads return None and writes return a falsy value, so callers can tell
+    # "could not reach the store" apart from "nothing there". The exception is
+    # apply_batch() raising NoteNotFoundError for a missing document.
+    #
+    # Documents carry the note fields plus user_id, created_at and updated_at (set by the
+    # store on every write) and a 'deleted' tombstone, so delta syncs see deletes.
+
+    @abstractmethod
+    def get_notes_for_user(self, user_id, since=None):
+        # Snapshots (.id, .to_dict()) of the user's notes with updated_at after `since`.
+        raise NotImplementedError
+
+    @abstractmethod
+    def watch_notes(self, user_id, since, callback):
+        # Calls callback([(type, snapshot), ...]) with type 'ADDED', 'MODIFIED' or
+        # 'REMOVED', first with every matching note, then as they change. Returns an
+        # object with unsubscribe() and is_active, or None.
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_note(self, note_data, user_id):
+        # Stores a new note under a generated id; returns an object with .id, or None.
+        raise NotImplementedError
+
+    @abstractmethod
+    def apply_batch(self, operations):
+        # operations: list of (op, note_id, payload) with op in 'set', 'update', 'delete'.
+        raise NotImplementedError
+
+    def set_note(self, note_id, note_data):
+        return self.apply_batch([('set', note_id, note_data)])
+
+    def update_note_status(self, note_id, new_status):
+        return self.apply_batch([('update', note_id, {'status': new_status})])
+
+    def update_note_fields(self, note_id, data):
+        return self.apply_batch([('update', note_id, data)])
+
+    def delete_note(self, note_id):
+        return self.apply_batch([('delete', note_id, None)])
+
+class StoredNote:
+    # Mirrors the parts of a Firestore DocumentSnapshot the sync code uses.
+    def __init__(self, note_id, data):
+        self.id = note_id
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+class _Watch:
+    def __init__(self, store, user_id, since, callback):
+        self.store = store
+        self.user_id = int(user_id)
+        self.since = since
+        self.callback = callback
+        self.is_active = True
+
+    def matches(self, data):
+        return data.get('user_id') == self.user_id and (self.since is None or data['updated_at'] > self.since)
+
+    def unsubscribe(self):
+        self.is_active = False
+        self.store._remove_watch(self)
+
+class DocumentNoteStore(NoteStore):
+    # Shared logic for the stores that keep documents themselves; subclasses provide
+    # _load(note_id), _query(user_id, since) and _save(changes), with _save applying a
+    # list of (note_id, data) atomically. Watches see writes made through this instance.
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._watches = []
+        self._last_timestamp = 0.0
+
+    def _timestamp(self):
+        # Strictly increasing, so "updated_at > watermark" never skips a write made in
+        # the same clock tick as the last one a sync has seen.
+        self._last_timestamp = max(time.time(), self._last_timestamp + 1e-6)
+        return self._last_timestamp
+
+    def _before_call(self):
+        # Hook for latency and failure injection.
+        pass
+
+    def get_notes_for_user(self, user_id, since=None):
+        if not user_id: return None
+        try:
+            self._before_call()
+            with self._lock:
+                return [StoredNote(note_id, data) for note_id, data in self._query(int(user_id), since)]
+        except Exception as e:
+            print(f"Error fetching notes from the {self.name} store: {e}")
+            return None
+
+    def watch_notes(self, user_id, since, callback):
+        if not user_id: return None
+        try:
+            self._before_call()
+            with self._lock:
+                watch = _Watch(self, user_id, since, callback)
+                initial = [('ADDED', StoredNote(note_id, data)) for note_id, data in self._query(watch.user_id, since)]
+                self._watches.append(watch)
+                callback(initial)  # under the lock, so no later write is delivered first
+        except Exception as e:
+            print(f"Error subscribing to the {self.name} store: {e}")
+            return None
+        return watch
+
+    def _remove_watch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def add_note(self, note_data, user_id):
+        if not user_id: return None
+        note_id = uuid.uuid4().hex
+        note_data['user_id'] = int(user_id)
+        if not self.apply_batch([('set', note_id, note_data)]):
+            return None
+        return SimpleNamespace(id=note_id)
+
+    def apply_batch(self, operations):
+        try:
+            self._before_call()
+            with self._lock:
+                now = self._timestamp()
+                pending, existed = {}, set()
+                for op, note_id, payload in operations:
+                    current = pending.get(note_id)
+                    if current is None:
+                        current = self._load(note_id)
+                        if current is not None:
+                            existed.add(note_id)
+                    if op == 'set':
+                        data = {**payload, 'created_at': now, 'updated_at': now}
+                    elif op in ('update', 'delete'):
+                        if current is None:
+                            raise NoteNotFoundError(note_id)
+                        changes = {'deleted': True} if op == 'delete' else payload
+                        data = {**current, **changes, 'updated_at': now}
+                    else:
+                        raise ValueError(f"Unknown batch operation '{op}'")
+                    pending[note_id] = copy.deepcopy(data)
+                self._save(list(pending.items()))
+                watches = list(self._watches)
+        except NoteNotFoundError:
+            raise
+        except Exception as e:
+            print(f"Error committing batch to the {self.name} store: {e}")
+            return False
+        for watch in watches:
+            changes = [('MODIFIED' if note_id in existed else 'ADDED', StoredNote(note_id, data))
+                       for note_id, data in pending.items() if watch.matches(data)]
+            if changes and watch.is_active:
+                watch.callback(changes)
+        return True
+
+class MemoryNoteStore(DocumentNoteStore):
+    # In-process fake for benchmarks and load tests. Every call sleeps `latency` seconds,
+    # or `slow_latency` for a `slow_ratio` share of calls, and fails for a `failure_rate`
+    # share. `seed` makes the injected delays and failures reproducible.
+
+    name = "memory"
+
+    def __init__(self, latency=0.0, slow_latency=None, slow_ratio=0.0, failure_rate=0.0, seed=None):
+        super().__init__()
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_ratio = slow_ratio
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._documents = {}
+        self.calls = 0
+
+    def _before_call(self):
+        with self._random_lock:
+            self.calls += 1
+            slow = self.slow_latency is not None and self._random.random() < self.slow_ratio
+            failed = self._random.random() < self.failure_rate
+        delay = self.slow_latency if slow else self.latency
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise ConnectionError("injected failure")
+
+    def _load(self, note_id):
+        data = self._documents.get(note_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    def _query(self, user_id, since):
+        return [(note_id, copy.deepcopy(data)) for note_id, data in self._documents.items()
+                if data.get('user_id') == user_id and (since is None or data['updated_at'] > since)]
+
+    def _save(self, changes):
+        self._documents.update(changes)
+
+    def disconnect_watches(self):
+        # Simulates dropped listeners; the realtime sync reconnects from its watermark.
+        with self._lock:
+            watches, self._watches = self._watches, []
+        for watch in watches:
+            watch.is_active = False
+
+class SQLiteNoteStore(DocumentNoteStore):
+    # Stands in for Firestore when running fully offline: documents are kept as JSON in
+    # a separate SQLite file, which the bot and the app can share. Other processes'
+    # writes reach the app through /api/sync or the bot's IPC push, not through watches.
+
+    name = "sqlite"
+
+    def __init__(self, path=LOCAL_STORE_PATH):
+        super().__init__()
+        self.path = path
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS documents (
+                        id TEXT PRIMARY KEY,
+                        user_id INTEGER,
+                        updated_at REAL NOT NULL,
+                        data TEXT NOT NULL
+                    )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_user_updated ON documents (user_id, updated_at)")
+            self._conn = conn
+        return self._conn
+
+    def _timestamp(self):
+        # Another process may have written a newer document since this one last did.
+        row = self._connection().execute("SELECT MAX(updated_at) FROM documents").fetchone()
+        self._last_timestamp = max(self._last_timestamp, row[0] or 0.0)
+        return super()._timestamp()
+
+    def _load(self, note_id):
+        row = self._connection().execute("SELECT data FROM documents WHERE id = ?", (note_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _query(self, user_id, since):
+        rows = self._connection().execute(
+            "SELECT id, data FROM documents WHERE user_id = ? AND updated_at > ? ORDER BY updated_at",
+            (user_id, -1 if since is None else since)
+        )
+        return [(note_id, json.loads(data)) for note_id, data in rows]
+
+    def _save(self, changes):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, user_id, updated_at, data) VALUES (?, ?, ?, ?)",
+                [(note_id, data.get('user_id'), data['updated_at'], json.dumps(data)) for note_id, data in changes]
+            )
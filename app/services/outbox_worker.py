@@ -0,0 +1,155 @@
+# File: app/services/outbox_worker.py
+
+import json
+import random
+import threading
+import time
+from app.core.database import (
+    get_due_outbox,
+    get_outbox_entries_for_notes,
+    get_next_outbox_attempt,
+    complete_outbox,
+    fail_outbox,
+    park_outbox
+)
+from app.services.note_store import BATCH_LIMIT, NoteNotFoundError
+from app.services.storage import note_store
+
+BACKOFF_BASE = 5  # seconds before the first retry
+BACKOFF_MAX = 30 * 60
+IDLE_WAIT = 300  # upper bound on sleep when the queue is empty
+MAX_ATTEMPTS = 12  # about two hours of retries before an entry is parked in outbox_failed
+
+def backoff_delay(attempts):
+    # Exponential backoff with "equal jitter": half fixed, half random.
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempts))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def coalesce(entries):
+    # Folds one note's queued mutations (oldest first) into a single operation.
+    # Returns (op, payload), with op None when nothing needs to reach Firestore,
+    # e.g. a note created and deleted before either write was pushed.
+    op, payload = None, None
+    created_locally = entries[0]['op'] == 'set'
+    for entry in entries:
+        data = json.loads(entry['payload']) if entry['payload'] else None
+        if entry['op'] == 'set':
+            op, payload = 'set', data
+        elif entry['op'] == 'update':
+            if op == 'delete':
+                continue
+            op, payload = (op or 'update'), {**(payload or {}), **data}
+        elif entry['op'] == 'delete':
+            op, payload = 'delete', None
+    if op == 'delete' and created_locally:
+        return None, None
+    return op, payload
+
+class OutboxWorker:
+    # Background thread that pushes queued local mutations to Firestore. wake() is
+    # called after every enqueue so new writes go out immediately.
+
+    def __init__(self, service=note_store):
+        self.service = service
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="outbox-worker", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _fail(self, groups, error):
+        # The whole batch gets one retry time, so after an outage it goes out again as a
+        # batch instead of one jittered write per note.
+        parked = [g for g in groups if max(e['attempts'] for e in g['entries']) + 1 >= MAX_ATTEMPTS]
+        retrying = [g for g in groups if g not in parked]
+        if parked:
+            self._park(parked, error)
+        if retrying:
+            attempts = max(e['attempts'] for g in retrying for e in g['entries'])
+            retry_at = time.time() + backoff_delay(attempts)
+            fail_outbox([(e['id'], error, retry_at) for g in retrying for e in g['entries']])
+            print(f"[Outbox] Push of {len(retrying)} note(s) failed, retrying later: {error}")
+
+    def _park(self, groups, error):
+        park_outbox([e['id'] for g in groups for e in g['entries']], error)
+        for group in groups:
+            print(f"[Outbox] Gave up on {group['op']} of note {group['note_id']}: {error}")
+
+    def _settle_missing(self, group, error):
+        # The document is gone: a delete has nothing left to do, and an update would
+        # fail on every retry.
+        if group['op'] == 'delete':
+            complete_outbox([e['id'] for e in group['entries']])
+        else:
+            self._park([group], error)
+
+    def _push(self, groups):
+        while groups:
+            operations = [(g['op'], g['note_id'], g['payload']) for g in groups]
+            try:
+                ok = self.service.apply_batch(operations)
+                error = None if ok else "Firestore batch write failed"
+            except NoteNotFoundError as e:
+                # The one failure that is about a document rather than the store. Settle
+                # that note and push the rest of the batch again.
+                missing = [g for g in groups if g['note_id'] == e.note_id]
+                if not missing and len(groups) > 1:
+                    # The store did not say which document; find it note by note.
+                    for group in groups:
+                        self._push([group])
+                    return
+                for group in missing or groups:
+                    self._settle_missing(group, e)
+                groups = [g for g in groups if missing and g not in missing]
+                continue
+            except Exception as e:
+                ok, error = False, e
+            if ok:
+                complete_outbox([e['id'] for g in groups for e in g['entries']])
+            else:
+                self._fail(groups, error)
+            return
+
+    def process_due(self):
+        heads = get_due_outbox(time.time(), limit=BATCH_LIMIT)
+        if not heads:
+            return
+        by_note = {}
+        for entry in get_outbox_entries_for_notes([head['note_id'] for head in heads]):
+            by_note.setdefault(entry['note_id'], []).append(entry)
+
+        groups, skipped = [], []
+        for note_id, entries in by_note.items():
+            op, payload = coalesce(entries)
+            if op is None:
+                skipped.extend(e['id'] for e in entries)
+            else:
+                groups.append({"note_id": note_id, "op": op, "payload": payload, "entries": entries})
+        if skipped:
+            complete_outbox(skipped)
+        if groups:
+            coalesced = sum(len(g['entries']) for g in groups) - len(groups)
+            print(f"[Outbox] Pushing {len(groups)} note(s), {coalesced} redundant operation(s) coalesced.")
+            self._push(groups)
+
+    def run(self):
+        print("[Outbox] Worker started.")
+        while True:
+            try:
+                self.process_due()
+                next_at = get_next_outbox_attempt()
+                timeout = IDLE_WAIT if next_at is None else max(0, min(IDLE_WAIT, next_at - time.time()))
+            except Exception as e:
+                print(f"[Outbox] Error while draining the queue: {e}")
+                timeout = BACKOFF_BASE
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+outbox_worker = OutboxWorker()
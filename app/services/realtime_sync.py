@@ -0,0 +1,157 @@
+# File: app/services/realtime_sync.py
+
+import queue
+import random
+import threading
+from app.config import REALTIME_CHECK_INTERVAL, REALTIME_BACKOFF_BASE, REALTIME_BACKOFF_MAX
+from app.core.database import get_sync_watermark, sync_notes_from_firestore, release_db_connection
+from app.services.storage import note_store
+from app.services.settings_service import settings_service
+
+def reconnect_delay(failures):
+    # Exponential backoff with "equal jitter", as in the outbox worker, on a shorter scale.
+    delay = min(REALTIME_BACKOFF_MAX, REALTIME_BACKOFF_BASE * (2 ** max(failures - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class RealtimeSync:
+    # Keeps the local database current with a snapshot listener on the user's notes in
+    # the note store (Firestore by default) instead of manual /api/sync calls. Each
+    # snapshot's document changes go through sync_notes_from_firestore(), which advances
+    # the delta-sync watermark, so after a dropped listener the new one subscribes from
+    # the watermark and receives only what changed in between. `service` is a NoteStore
+    # (see NoteStore.watch_notes).
+    #
+    # Stores deliver snapshots on threads of their own (Firestore's listener thread, or
+    # whichever thread wrote to the in-memory store), so the callback only queues them;
+    # the supervisor thread applies them with its own database connection.
+
+    def __init__(self, service=note_store):
+        self.service = service
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._user_id = None
+        self._generation = 0
+        self._failed = False
+        self._full_sync = False
+        self._changes = queue.Queue()
+        self._watching = False
+        self.stats = {"connects": 0, "failures": 0, "snapshots": 0}
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def sync_with_settings(self, settings=None):
+        # Starts, retargets or stops the listener to match realtime_sync and telegram_id.
+        # Registered as a settings listener on first call.
+        if not self._watching:
+            self._watching = True
+            settings_service.add_listener(self.sync_with_settings)
+        settings = settings if settings is not None else settings_service.get()
+        user_id = settings.get("telegram_id") if settings.get("realtime_sync") else None
+        with self._lock:
+            self._user_id = user_id or None
+            if self._user_id and self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="realtime-sync", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self):
+        with self._lock:
+            self._user_id = None
+        self._wake.set()
+
+    def run(self):
+        watch, watched_user, failures = None, None, 0
+        while True:
+            self._apply_changes()
+            with self._lock:
+                user_id, failed = self._user_id, self._failed
+                if user_id is None and watch is None:
+                    self._thread = None
+                    return
+            alive = watch is not None and getattr(watch, 'is_active', True)
+            if watch is not None and (user_id != watched_user or failed or not alive):
+                self._unsubscribe(watch)
+                watch = None
+                if user_id == watched_user:
+                    failures += 1
+                    self.stats["failures"] += 1
+                    print(f"[Realtime] Listener stopped; reconnecting (attempt {failures}).")
+                continue
+
+            if watch is None:
+                if failures and self._wait(reconnect_delay(failures)):
+                    continue  # settings changed while waiting
+                watch = self._subscribe(user_id)
+                if watch is None:
+                    failures += 1
+                    self.stats["failures"] += 1
+                    continue
+                watched_user = user_id
+                self.stats["connects"] += 1
+                failures = 0
+            self._wait(REALTIME_CHECK_INTERVAL)
+
+    def _wait(self, timeout):
+        woken = self._wake.wait(timeout)
+        self._wake.clear()
+        return woken
+
+    def _subscribe(self, user_id):
+        since = get_sync_watermark(user_id)
+        release_db_connection()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._failed = False
+            # Without a watermark the first snapshot is the full set of notes, so local
+            # rows missing from it are stale, exactly as in a full /api/sync.
+            self._full_sync = since is None
+
+        def on_changes(changes):
+            if generation != self._generation:
+                return  # late delivery to a listener that has been replaced
+            self._changes.put((generation, user_id, changes))
+            self._wake.set()
+
+        watch = self.service.watch_notes(user_id, since, on_changes)
+        if watch is not None:
+            print(f"[Realtime] Listening for note changes since {since or 'the beginning'}.")
+        return watch
+
+    def _apply_changes(self):
+        try:
+            while True:
+                try:
+                    generation, user_id, changes = self._changes.get_nowait()
+                except queue.Empty:
+                    return
+                with self._lock:
+                    if generation != self._generation or self._failed:
+                        continue  # from a replaced listener, or after a failed apply
+                    full_sync = self._full_sync
+                try:
+                    upserts = [doc for kind, doc in changes if kind != 'REMOVED']
+                    removed = [doc.id for kind, doc in changes if kind == 'REMOVED']
+                    sync_notes_from_firestore(upserts, user_id=user_id, full_sync=full_sync, removed_ids=removed)
+                    self._full_sync = False
+                    self.stats["snapshots"] += 1
+                except Exception as e:
+                    # The listener is replaced and resubscribes from the watermark.
+                    print(f"[Realtime] Could not apply Firestore changes: {e}")
+                    with self._lock:
+                        self._failed = True
+        finally:
+            release_db_connection()
+
+    def _unsubscribe(self, watch):
+        with self._lock:
+            self._generation += 1
+        try:
+            watch.unsubscribe()
+        except Exception as e:
+            print(f"[Realtime] Error closing the Firestore listener: {e}")
+
+realtime_sync = RealtimeSync()
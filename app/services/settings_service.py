@@ -0,0 +1,156 @@
+# File: app/services/settings_service.py
+
+import copy
+import json
+import os
+import re
+import tempfile
+import threading
+from app.config import SETTINGS_FILE
+
+DEFAULT_SETTINGS = {"telegram_token": "", "telegram_id": ""}
+
+# Known keys and their accepted types. Unknown keys are kept as they are so newer
+# settings written by another version of the app survive a save.
+SETTINGS_SCHEMA = {
+    "telegram_token": str,
+    "telegram_id": (str, int),
+    "groq_api_key": str,
+    "telegram_mode": str,
+    "telegram_webhook_url": str,
+    "telegram_webhook_secret": str,
+    "realtime_sync": bool,
+}
+TELEGRAM_MODES = ("polling", "webhook")
+_TELEGRAM_ID_RE = re.compile(r'^-?\d*$')
+_WEBHOOK_SECRET_RE = re.compile(r'^[A-Za-z0-9_-]{0,256}$')
+
+def validate_settings(data):
+    # Returns a normalized copy of `data`, or raises ValueError describing the first problem.
+    if not isinstance(data, dict):
+        raise ValueError("Settings must be a JSON object.")
+    settings = {**DEFAULT_SETTINGS, **data}
+    for key, expected in SETTINGS_SCHEMA.items():
+        value = settings.get(key)
+        if value is None:
+            continue
+        if (isinstance(value, bool) and expected is not bool) or not isinstance(value, expected):
+            raise ValueError(f"Setting '{key}' has an invalid type.")
+        if isinstance(value, str):
+            settings[key] = value.strip()
+    if not _TELEGRAM_ID_RE.match(str(settings["telegram_id"])):
+        raise ValueError("Setting 'telegram_id' must be a numeric Telegram user ID.")
+    settings["telegram_id"] = str(settings["telegram_id"])
+    if settings.get("telegram_mode") and settings["telegram_mode"] not in TELEGRAM_MODES:
+        raise ValueError(f"Setting 'telegram_mode' must be one of: {', '.join(TELEGRAM_MODES)}.")
+    if settings.get("telegram_webhook_url") and not settings["telegram_webhook_url"].startswith("https://"):
+        raise ValueError("Setting 'telegram_webhook_url' must be an https:// URL.")
+    if not _WEBHOOK_SECRET_RE.match(settings.get("telegram_webhook_secret") or ""):
+        raise ValueError("Setting 'telegram_webhook_secret' may only contain A-Z, a-z, 0-9, _ and -.")
+    return settings
+
+class SettingsService:
+    # Keeps settings.json parsed in memory. Each read costs one os.stat(); the file is
+    # only re-read and re-validated when its mtime or size changes, e.g. after an edit
+    # by hand or a save from another process (the bot runs separately).
+
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._settings = None
+        self._signature = None
+        self._listeners = []
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r') as f:
+                return validate_settings(json.load(f))
+        except FileNotFoundError:
+            return dict(DEFAULT_SETTINGS)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"[Settings] Ignoring invalid {self.path}: {e}")
+            return dict(DEFAULT_SETTINGS)
+
+    def get(self):
+        # Callers get their own copy, so mutating it cannot corrupt the cache.
+        signature = self._stat_signature()
+        changed = False
+        with self._lock:
+            if self._settings is None or signature != self._signature:
+                changed = self._settings is not None
+                self._settings = self._read_file()
+                self._signature = signature
+            settings = copy.deepcopy(self._settings)
+        if changed:
+            self._notify(settings)
+        return settings
+
+    def save(self, data):
+        settings = validate_settings(data)
+        with self._lock:
+            self._write_atomic(settings)
+            self._settings = settings
+            self._signature = self._stat_signature()
+        self._notify(copy.deepcopy(settings))
+        return copy.deepcopy(settings)
+
+    def update(self, changes):
+        # Merges `changes` into the current settings, so a form that only edits some
+        # keys (the Telegram panel) does not drop the others (groq_api_key).
+        with self._lock:
+            current = copy.deepcopy(self._settings) if self._settings is not None else None
+        if current is None:
+            current = self.get()
+        if not isinstance(changes, dict):
+            raise ValueError("Settings must be a JSON object.")
+        return self.save({**current, **changes})
+
+    def _write_atomic(self, settings):
+        # Written to a temp file in the same directory and renamed over the old one,
+        # so readers see either the previous file or the new one, never a partial write.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.settings-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(settings, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def add_listener(self, callback):
+        # callback(settings) runs after a save, or when a change on disk is noticed.
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, settings):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(settings)
+            except Exception as e:
+                print(f"[Settings] Listener error: {e}")
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+settings_service = SettingsService()
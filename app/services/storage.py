@@ -0,0 +1,18 @@
+# File: app/services/storage.py
+
+from app.config import STORAGE_BACKEND, MEMORY_STORE_LATENCY, MEMORY_STORE_FAILURE_RATE, MEMORY_STORE_SEED
+from app.services.note_store import MemoryNoteStore, SQLiteNoteStore
+
+def create_note_store(backend=STORAGE_BACKEND):
+    if backend == 'firestore':
+        # firebase_admin itself is still only imported on first use.
+        from app.services.firebase_service import firebase_service
+        return firebase_service
+    if backend == 'sqlite':
+        return SQLiteNoteStore()
+    if backend == 'memory':
+        seed = int(MEMORY_STORE_SEED) if MEMORY_STORE_SEED else None
+        return MemoryNoteStore(latency=MEMORY_STORE_LATENCY, failure_rate=MEMORY_STORE_FAILURE_RATE, seed=seed)
+    raise ValueError(f"Unknown storage backend '{backend}'; use firestore, sqlite or memory.")
+
+note_store = create_note_store()
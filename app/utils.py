@@ -1,61 +1,96 @@
 # File: app/utils.py
 
-import os
-import json
-import dateparser
-from .config import SETTINGS_FILE
+import re
+from .services.settings_service import settings_service
+from .core.deadline_parser import parse_deadline
 
 def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {"telegram_token": "", "telegram_id": ""}
-    return {"telegram_token": "", "telegram_id": ""}
-
-def save_settings(data):
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+    return settings_service.get()
 
-def parse_note_text(text: str):
+FIELD_ALIASES = {
+    'mata_kuliah': ['matakuliah', 'matkul', 'mk'],
+    'deskripsi_tugas': ['tugas', 'deskripsi', 'task', 'apa'],
+    'deadline': ['deadline', 'dl', 'tenggat', 'kapan'],
+    'priority': ['prioritas', 'priority'],
+}
+PRIORITY_VALUES = {
+    'tinggi': 'high', 'penting': 'high', 'high': 'high',
+    'sedang': 'medium', 'normal': 'medium', 'medium': 'medium',
+    'rendah': 'low', 'low': 'low',
+}
+
+# Built once at import. A field starts at the beginning of a line or after a comma
+# with "<alias> "; commas that are not followed by an alias belong to the value.
+_ALIAS_TO_FIELD = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+_ALIAS_PATTERN = '|'.join(sorted(map(re.escape, _ALIAS_TO_FIELD), key=len, reverse=True))
+_FIELD_START_RE = re.compile(r'\s*(' + _ALIAS_PATTERN + r')\s+', re.IGNORECASE)
+_NEXT_FIELD_RE = re.compile(r',(?=\s*(?:' + _ALIAS_PATTERN + r')\s)', re.IGNORECASE)
+_QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'')
+
+def tokenize_note_line(line):
+    # Single left-to-right pass over one line; returns {field: raw value}.
+    fields = {}
+    pos, end = 0, len(line)
+    while pos < end:
+        start = _FIELD_START_RE.match(line, pos)
+        if not start:
+            # Text that does not start with a keyword is skipped up to the next field.
+            nxt = _NEXT_FIELD_RE.search(line, pos)
+            pos = nxt.end() if nxt else end
+            continue
+        field = _ALIAS_TO_FIELD[start.group(1).lower()]
+        pos = start.end()
+        quoted = _QUOTED_RE.match(line, pos)
+        if quoted:
+            value = quoted.group(1) if quoted.group(1) is not None else quoted.group(2)
+            value = re.sub(r'\\(.)', r'\1', value)
+            pos = quoted.end()
+            nxt = _NEXT_FIELD_RE.search(line, pos)
+            pos = nxt.end() if nxt else end
+        else:
+            nxt = _NEXT_FIELD_RE.search(line, pos)
+            value = line[pos:nxt.start()] if nxt else line[pos:]
+            pos = nxt.end() if nxt else end
+        value = value.strip()
+        if value:
+            fields[field] = value
+    return fields
+
+def parse_note_fields(fields):
+    # Validates raw field values and resolves the deadline. Shared by the bot and the
+    # /api/notes endpoints so both accept exactly the same input.
     data = {}
-    keywords = {
-        'mata_kuliah': ['matakuliah', 'matkul', 'mk'],
-        'deskripsi_tugas': ['tugas', 'deskripsi', 'task', 'apa'],
-        'deadline': ['deadline', 'dl', 'tenggat', 'kapan']
-    }
-    try:
-        parts = text.split(',')
-        if len(parts) < 3:
-            return None, "Incorrect format. Make sure the subject, assignment, and deadline are separated by commas (',')."
-
-        for part in parts:
-            part = part.strip()
-            matched = False
-            for key, aliases in keywords.items():
-                for alias in aliases:
-                    if part.lower().startswith(alias + " "):
-                        value = part[len(alias)+1:].strip()
-                        if value: data[key] = value
-                        matched = True
-                        break
-                if matched: break
-        
-        if 'mata_kuliah' not in data or 'deskripsi_tugas' not in data or 'deadline' not in data:
+    for key in ('mata_kuliah', 'deskripsi_tugas', 'deadline'):
+        value = fields.get(key)
+        if value is None or not str(value).strip():
             return None, "Incomplete format. Please ensure keyword 'matkul', 'tugas', dan 'deadline' exists and has content."
+        data[key] = str(value).strip()
+
+    priority = fields.get('priority')
+    if priority:
+        data['priority'] = PRIORITY_VALUES.get(str(priority).strip().lower())
+        if not data['priority']:
+            return None, f"Priority '{priority}' not recognized. Use tinggi, sedang or rendah."
 
-        deadline_str_value = data.get('deadline')
-        deadline_dt = dateparser.parse(deadline_str_value, settings={'PREFER_DATES_FROM': 'future', 'TIMEZONE': 'Asia/Jakarta'})
-        
-        if not deadline_dt:
-            return None, f"Date format '{deadline_str_value}' not recognized."
-
-        del data['deadline']
-        data['deadline_timestamp'] = int(deadline_dt.timestamp())
-        data['tanggal_deadline_str'] = deadline_dt.strftime("%d %B %Y %H:%M")
-        data['deadline_iso_str'] = deadline_dt.strftime('%Y-%m-%d')
-        
-        return data, None
+    deadline_str_value = data.pop('deadline')
+    try:
+        deadline_dt = parse_deadline(deadline_str_value)
     except Exception as e:
-        return None, f"An error occurred while processing the message: {e}"
\ No newline at end of file
+        return None, f"An error occurred while processing the message: {e}"
+    if not deadline_dt:
+        return None, f"Date format '{deadline_str_value}' not recognized."
+
+    data['deadline_timestamp'] = int(deadline_dt.timestamp())
+    data['tanggal_deadline_str'] = deadline_dt.strftime("%d %B %Y %H:%M")
+    data['deadline_iso_str'] = deadline_dt.strftime('%Y-%m-%d')
+    return data, None
+
+def parse_note_text(text: str):
+    fields = tokenize_note_line(' '.join(text.split('\n')))
+    if not fields:
+        return None, "Incorrect format. Make sure the subject, assignment, and deadline are separated by commas (',')."
+    return parse_note_fields(fields)
+
+def parse_notes_text(text: str):
+    # One note per non-empty line; returns a list of (data, error) in line order.
+    return [parse_note_text(line) for line in text.splitlines() if line.strip()]
@@ -0,0 +1,86 @@
+# File: benchmarks/bench_api_sync.py
+#
+# Measures the sync and notes API paths of api_server against the in-memory note store
+# (NOTES_APP_BACKEND=memory), so results do not depend on the network or on Firestore:
+# a full /api/sync into an empty database, delta syncs after a few remote edits, and
+# GET /api/notes. Uses a throwaway database; background services are not started.
+# Run from the project root: python benchmarks/bench_api_sync.py [--notes 2000]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+USER_ID = "123456"
+
+def seed_notes(store, count):
+    from app.services.note_store import BATCH_LIMIT
+    operations = [
+        ('set', f"note-{i:06d}", {
+            "mata_kuliah": f"Matkul {i % 12}",
+            "deskripsi_tugas": f"Tugas nomor {i}",
+            "deadline_timestamp": 1767225600 + i * 3600,
+            "tanggal_deadline_str": "01 January 2026, 00:00",
+            "deadline_iso_str": "2026-01-01T00:00",
+            "status": "pending",
+            "priority": None,
+            "user_id": int(USER_ID),
+        })
+        for i in range(count)
+    ]
+    for start in range(0, count, BATCH_LIMIT):
+        store.apply_batch(operations[start:start + BATCH_LIMIT])
+
+def timed(client, method, path):
+    started = time.perf_counter()
+    response = client.open(path, method=method)
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f"{method} {path} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=2000)
+    parser.add_argument('--edits', type=int, default=20, help='remote edits before each delta sync')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    # Picked up by app.config, so they must be set before the app is imported.
+    os.environ["NOTES_APP_BACKEND"] = "memory"
+    os.environ["NOTES_APP_MEMORY_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["NOTES_APP_MEMORY_SEED"] = "1"
+
+    from app.core import database
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'notes.db')
+    import api_server
+    api_server.app.before_request_funcs[None].remove(api_server.start_background_services)
+    api_server.load_settings = lambda: {"telegram_id": USER_ID}
+    store = api_server.note_store
+
+    seed_notes(store, args.notes)
+    client = api_server.app.test_client()
+
+    print(f"{args.notes} notes, {args.edits} edits per delta sync, store latency {args.latency_ms:.0f} ms")
+    print(f"{'full sync':<20} {timed(client, 'POST', '/api/sync'):8.1f} ms")
+
+    deltas, listings = [], []
+    for run in range(args.runs):
+        store.apply_batch([
+            ('update', f"note-{(run * args.edits + i) % args.notes:06d}", {"status": "done" if run % 2 else "pending"})
+            for i in range(args.edits)
+        ])
+        deltas.append(timed(client, 'POST', '/api/sync'))
+        listings.append(timed(client, 'GET', '/api/notes'))
+
+    for label, values in (("delta sync", deltas), ("GET /api/notes", listings)):
+        print(f"{label:<20} {statistics.median(values):8.1f} ms median  {max(values):8.1f} ms max")
+
+if __name__ == '__main__':
+    main()
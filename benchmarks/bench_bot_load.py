@@ -0,0 +1,100 @@
+# File: benchmarks/bench_bot_load.py
+#
+# Replays a burst of fake Telegram updates through bot.bot_logic.handle_message, with
+# Firestore replaced by the in-memory note store sleeping like a network round-trip and
+# the desktop app by a local IPC server. Reports per-update handling latency.
+# python-telegram-bot is not needed; updates are dispatched the way Application does
+# with concurrent_updates.
+# Run from the project root: python benchmarks/bench_bot_load.py [--updates 200]
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import BOT_CONCURRENT_UPDATES
+from app.services.local_ipc import LocalIPC
+from app.services.note_store import MemoryNoteStore
+from bot import bot_logic
+
+USER_ID = "123456"
+MESSAGES = [
+    "matkul Kalkulus, tugas latihan integral, deadline besok",
+    "matkul Basis Data, tugas ERD perpustakaan, deadline 24/12/2025 23:59",
+    "matkul Fisika, tugas laporan praktikum, deadline minggu depan\n"
+    "matkul Kimia, tugas ringkasan bab 2, deadline lusa jam 10:00",
+    "matkul Sejarah, tugas esai, deadline next friday, prioritas tinggi",
+    "matkul \"Etika, Hukum\", tugas studi kasus, deadline 2025-12-30",
+]
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.from_user = SimpleNamespace(id=int(USER_ID), first_name="Load")
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        await asyncio.sleep(0.002)  # Bot API call
+        self.replies += 1
+
+async def replay(updates, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def handle(update):
+        # Measured from arrival, so time spent queued behind other updates counts.
+        started = time.perf_counter()
+        async with semaphore:
+            await bot_logic.handle_message(update, None)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(update) for update in updates))
+    return latencies, time.perf_counter() - started
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=BOT_CONCURRENT_UPDATES)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--slow-ms', type=float, default=1500)
+    parser.add_argument('--slow-ratio', type=float, default=0.02)
+    args = parser.parse_args()
+
+    # The app side only acknowledges; its SQLite write is not what is measured here.
+    info_file = os.path.join(tempfile.mkdtemp(), 'ipc.json')
+    app_ipc = LocalIPC(info_file)
+    app_ipc.start(lambda notes: len(notes))
+
+    bot_logic.note_store = MemoryNoteStore(latency=args.latency_ms / 1000, slow_latency=args.slow_ms / 1000,
+                                           slow_ratio=args.slow_ratio, seed=1)
+    bot_logic.load_settings = lambda: {"telegram_id": USER_ID}
+    bot_logic.local_ipc = LocalIPC(info_file)
+
+    # Warm up dateparser and the IPC connection path so the first updates are not skewed.
+    asyncio.run(replay([SimpleNamespace(message=FakeMessage(m)) for m in MESSAGES], len(MESSAGES)))
+
+    random.seed(1)
+    updates = [SimpleNamespace(message=FakeMessage(random.choice(MESSAGES))) for _ in range(args.updates)]
+    print(f"{args.updates} updates, concurrency {args.concurrency}, Firestore write "
+          f"{args.latency_ms:.0f} ms ({args.slow_ratio:.0%} at {args.slow_ms:.0f} ms)")
+    for label, concurrency in (("sequential (PTB default)", 1), ("concurrent", args.concurrency)):
+        latencies, elapsed = asyncio.run(replay(updates, concurrency))
+        ms = [value * 1000 for value in latencies]
+        print(f"{label:<26} p50 {percentile(ms, 0.5):8.1f} ms  p99 {percentile(ms, 0.99):8.1f} ms  "
+              f"mean {statistics.mean(ms):8.1f} ms  {len(ms) / elapsed:7.1f} updates/s")
+    app_ipc.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# File: benchmarks/bench_deadline_parser.py
+#
+# Compares the old per-call dateparser.parse() against app.core.deadline_parser.
+# Run from the project root: python benchmarks/bench_deadline_parser.py
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SAMPLES = [
+    '2025-12-24', '24/12/2025', '24/12/2025 23:59', 'besok', 'besok jam 10:00',
+    'minggu depan', 'tomorrow', '25 desember 2025', 'next friday', 'senin', 'in 3 days',
+]
+ROUNDS = 20
+
+def timed(fn, label):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    calls = len(SAMPLES) * ROUNDS
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms total  {elapsed / calls * 1e6:9.1f} us/call")
+    return elapsed
+
+def main():
+    start = time.perf_counter()
+    import dateparser
+    dateparser.parse('besok', settings={'PREFER_DATES_FROM': 'future', 'TIMEZONE': 'Asia/Jakarta'})
+    print(f"{'dateparser first call':<34} {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    def baseline():
+        for _ in range(ROUNDS):
+            for text in SAMPLES:
+                dateparser.parse(text, settings={'PREFER_DATES_FROM': 'future', 'TIMEZONE': 'Asia/Jakarta'})
+
+    from app.core import deadline_parser
+
+    def cold():
+        # Every round starts from an empty cache, so each call really parses.
+        for _ in range(ROUNDS):
+            deadline_parser.clear_cache()
+            for text in SAMPLES:
+                deadline_parser.parse_deadline(text)
+
+    def warm_engine():
+        for _ in range(ROUNDS):
+            for text in SAMPLES:
+                deadline_parser.parse_deadline(text)
+
+    base = timed(baseline, "dateparser.parse (old path)")
+    fast = timed(cold, "parse_deadline (cold cache)")
+    warm = timed(warm_engine, "parse_deadline (warm cache)")
+    print(f"speedup: {base / fast:.1f}x cold, {base / warm:.1f}x warm; {deadline_parser.cache_info()}")
+
+if __name__ == '__main__':
+    main()
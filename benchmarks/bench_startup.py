@@ -0,0 +1,64 @@
+# File: benchmarks/bench_startup.py
+#
+# Measures the import cost of api_server with `python -X importtime` and fails when it
+# exceeds the startup budget or when a lazily loaded dependency is imported eagerly.
+# Run from the project root: python benchmarks/bench_startup.py [--budget-ms 600]
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_BUDGET_MS = 600
+RUNS = 5
+
+# Must not be imported just to show the window. (`requests` is not listed: python-socketio
+# imports it for its client, which Flask-SocketIO loads unconditionally.)
+LAZY_MODULES = ['firebase_admin', 'google.cloud.firestore', 'dateparser', 'telegram', 'plyer']
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = int(cumulative)
+    return imports
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='api_server')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    # Best of several runs, to keep filesystem cache noise out of the comparison.
+    runs = [measure(args.module) for _ in range(RUNS)]
+    best = min(runs, key=lambda imports: imports[args.module])
+    total_ms = best[args.module] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {RUNS})")
+    print("Slowest imports (cumulative):")
+    for name, cumulative in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:11]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in best]
+    failed = False
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
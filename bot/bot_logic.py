@@ -1,26 +1,67 @@
 # File: bot/bot_logic.py
 
-import requests
-from telegram import Update
-from telegram.ext import ContextTypes
+from __future__ import annotations
 
-from app.utils import load_settings, parse_note_text
-from app.services.firebase_service import firebase_service
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
+from app.config import LOCAL_API_URL, BOT_WORKER_THREADS
+from app.utils import load_settings, parse_notes_text
+from app.services.storage import note_store
+from app.services.http_client import http_client
+from app.services.local_ipc import local_ipc
+
+# Firestore's client, dateparser and the HTTP client are synchronous; they run here so
+# one slow write does not hold up updates from other chats.
+executor = ThreadPoolExecutor(max_workers=BOT_WORKER_THREADS, thread_name_prefix="bot-io")
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def request_local_sync():
+    # Pulls the new notes into the desktop app's local database, if it is running.
+    try:
+        http_client.post(f"{LOCAL_API_URL}/api/sync", timeout=(2, 30), retries=1)
+    except Exception as e:
+        print(f"Could not ask the desktop app to sync: {e}")
+
+def note_payload(parsed_data, user_id):
+    # The local row for a note just written to Firestore. add_note() puts SERVER_TIMESTAMP
+    # sentinels into parsed_data, so the timestamps are taken here instead.
+    data = {key: value for key, value in parsed_data.items() if key not in ('created_at', 'updated_at')}
+    data['user_id'] = int(user_id)
+    data['updated_at'] = time.time()
+    return data
+
+def deliver_to_app(notes):
+    # Hands the new notes to the desktop app directly; a full sync is the fallback
+    # when it is not listening (an older version, or not running at all).
+    if not local_ipc.publish_notes(notes):
+        request_local_sync()
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_name = update.message.from_user.first_name
     await update.message.reply_text(
         f"Halo, {user_name}!\n\n"
         "Saya siap mencatat tugasmu. Kirim dengan format:\n\n"
-        "`matkul [nama matkul], tugas [deskripsi tugas], deadline [tanggal]`",
+        "`matkul [nama matkul], tugas [deskripsi tugas], deadline [tanggal]`\n\n"
+        "Tambahkan `prioritas [tinggi/sedang/rendah]` bila perlu, pakai tanda kutip "
+        "untuk teks yang berisi koma, dan satu tugas per baris untuk beberapa tugas sekaligus.",
         parse_mode='Markdown'
     )
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_text = update.message.text
     
-    settings = load_settings()
+    settings = await run_blocking(load_settings)
     user_id = settings.get("telegram_id")
 
     if not user_id:
@@ -31,24 +72,33 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Sorry, you are not registered to use this bot..")
         return
 
-    parsed_data, error_message = parse_note_text(user_text)
-    
-    if error_message:
-        await update.message.reply_text(f"⚠️ Oops! {error_message}")
-        return
-        
-    doc_ref = firebase_service.add_note(parsed_data, user_id) 
-    
-    if doc_ref:
-        reply_text = (
-            f"✅ **Tugas Berhasil Disimpan!**\n\n"
-            f"📖 **Mata Kuliah:** {parsed_data['mata_kuliah']}\n"
-            f"📝 **Tugas:** {parsed_data['deskripsi_tugas']}\n"
-            f"🗓️ **Deadline:** {parsed_data['tanggal_deadline_str']}"
-        )
-        await update.message.reply_text(reply_text, parse_mode='Markdown')
-    else:
-        await update.message.reply_text("Sorry, an error occurred while saving data to the database.")
-        
-    requests.post("http://127.0.0.1:5000/api/sync")
+    parsed_notes = await run_blocking(parse_notes_text, user_text)
+    # All notes of a message are written to Firestore at once; replies keep their order.
+    results = await asyncio.gather(*(
+        run_blocking(note_store.add_note, parsed_data, user_id)
+        for parsed_data, error_message in parsed_notes if not error_message
+    ))
+    results = iter(results)
+
+    saved = []
+    for parsed_data, error_message in parsed_notes:
+        if error_message:
+            await update.message.reply_text(f"⚠️ Oops! {error_message}")
+            continue
+
+        doc_ref = next(results)
+
+        if doc_ref:
+            saved.append((doc_ref.id, note_payload(parsed_data, user_id)))
+            reply_text = (
+                f"✅ **Tugas Berhasil Disimpan!**\n\n"
+                f"📖 **Mata Kuliah:** {parsed_data['mata_kuliah']}\n"
+                f"📝 **Tugas:** {parsed_data['deskripsi_tugas']}\n"
+                f"🗓️ **Deadline:** {parsed_data['tanggal_deadline_str']}"
+            )
+            await update.message.reply_text(reply_text, parse_mode='Markdown')
+        else:
+            await update.message.reply_text("Sorry, an error occurred while saving data to the database.")
 
+    if saved:
+        await run_blocking(deliver_to_app, saved)
@@ -7,7 +7,21 @@ from telegram.ext import Application, CommandHandler, MessageHandler, filters
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from bot.bot_logic import handle_message, start_command
-from api_server import load_settings 
+from app.config import BOT_CONCURRENT_UPDATES, TELEGRAM_API_URL
+from app.utils import load_settings
+
+def build_application(token, updater=True):
+    # Updates from different chats are handled concurrently instead of one at a time.
+    builder = (Application.builder().token(token).base_url(TELEGRAM_API_URL)
+               .concurrent_updates(BOT_CONCURRENT_UPDATES))
+    if not updater:
+        builder = builder.updater(None)  # webhook mode: updates are fed in by bot/webhook.py
+    application = builder.build()
+
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return application
+
 def main():
     print("Starting bot...")
     settings = load_settings()
@@ -18,13 +32,16 @@ def main():
         print("Error: TELEGRAM_TOKEN has not been set. Please set it via the Settings panel in the app..")
         return
 
-    application = Application.builder().token(token).build()
+    if settings.get("telegram_mode") == "webhook":
+        print("Telegram mode is 'webhook': updates are received by the app server at /telegram/webhook. "
+              "Switch telegram_mode to 'polling' in the settings to use this script.")
+        return
 
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application = build_application(token)
 
     print("Telegram bot is running... Press Ctrl+C to stop.")
+    # Polling removes any webhook that was registered earlier.
     application.run_polling()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
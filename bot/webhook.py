@@ -0,0 +1,137 @@
+# File: bot/webhook.py
+
+import asyncio
+import hmac
+import secrets
+import threading
+from collections import deque
+from app.config import TELEGRAM_WEBHOOK_PATH, TELEGRAM_WEBHOOK_QUEUE_SIZE
+from app.services.settings_service import settings_service
+
+RECENT_UPDATE_IDS = 1000  # Telegram re-delivers an update until it gets a 200
+
+class TelegramWebhook:
+    # Webhook ingestion for the bot inside the app server process. The Flask route hands
+    # each verified update to submit(), which queues it on the Application's update
+    # queue; the Application runs on its own event loop thread and dispatches updates to
+    # the same handlers as polling mode (bot.run_bot.build_application).
+
+    def __init__(self):
+        self.secret = None
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._application = None
+        self._running = threading.Event()
+        self._recent_ids = deque(maxlen=RECENT_UPDATE_IDS)
+        self._recent_set = set()
+        self._watching = False
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def sync_with_settings(self, settings=None):
+        # Starts or stops the webhook to match telegram_mode. Registered as a settings
+        # listener on first call, so switching mode in the Settings panel takes effect.
+        if not self._watching:
+            self._watching = True
+            settings_service.add_listener(self.sync_with_settings)
+        settings = settings if settings is not None else settings_service.get()
+        if settings.get("telegram_mode") == "webhook" and settings.get("telegram_token"):
+            self.start(settings)
+        elif self.running:
+            self.stop()
+
+    def start(self, settings):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.secret = settings.get("telegram_webhook_secret")
+            generated = not self.secret
+            if generated:
+                # Telegram echoes this back in X-Telegram-Bot-Api-Secret-Token.
+                self.secret = secrets.token_urlsafe(32)
+            self._thread = threading.Thread(
+                target=self._run, args=(settings["telegram_token"], settings.get("telegram_webhook_url")),
+                name="telegram-webhook", daemon=True
+            )
+            self._thread.start()
+        if generated:
+            # Kept in the settings so the registered webhook stays valid across restarts.
+            settings_service.update({"telegram_webhook_secret": self.secret})
+
+    def _run(self, token, public_url):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_application(token, public_url))
+        except Exception as e:
+            print(f"[Webhook] Could not start the Telegram bot: {e}")
+            with self._lock:
+                self._thread = None
+            return
+        self._running.set()
+        print("[Webhook] Telegram bot is receiving updates via webhook.")
+        self._loop.run_forever()
+
+    async def _start_application(self, token, public_url):
+        from bot.run_bot import build_application
+        self._application = build_application(token, updater=False)
+        await self._application.initialize()
+        await self._application.start()
+        if public_url:
+            await self._application.bot.set_webhook(
+                url=public_url.rstrip('/') + TELEGRAM_WEBHOOK_PATH,
+                secret_token=self.secret,
+                allowed_updates=["message"]
+            )
+        else:
+            print("[Webhook] telegram_webhook_url is not set; the webhook must be registered manually.")
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None or self._loop is None:
+                return
+            loop, application = self._loop, self._application
+            self._running.clear()
+            self._thread = None
+
+        async def shutdown():
+            await application.stop()
+            await application.shutdown()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=30)
+        loop.call_soon_threadsafe(loop.stop)
+        print("[Webhook] Telegram webhook stopped.")
+
+    def verify(self, token):
+        return bool(self.secret) and hmac.compare_digest((token or '').encode(), self.secret.encode())
+
+    def _is_duplicate(self, update_id):
+        with self._lock:
+            if update_id in self._recent_set:
+                return True
+            if len(self._recent_ids) == self._recent_ids.maxlen:
+                self._recent_set.discard(self._recent_ids[0])
+            self._recent_ids.append(update_id)
+            self._recent_set.add(update_id)
+            return False
+
+    def submit(self, data):
+        # Returns 'queued', 'duplicate' or 'full'. Never waits for the handler, so
+        # Telegram gets its 200 straight away.
+        if self._application.update_queue.qsize() >= TELEGRAM_WEBHOOK_QUEUE_SIZE:
+            return 'full'
+        if self._is_duplicate(data.get('update_id')):
+            return 'duplicate'
+        from telegram import Update
+        application = self._application
+
+        async def enqueue():
+            await application.update_queue.put(Update.de_json(data, application.bot))
+
+        asyncio.run_coroutine_threadsafe(enqueue(), self._loop)
+        return 'queued'
+
+telegram_webhook = TelegramWebhook()
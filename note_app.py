@@ -2,17 +2,19 @@
 
 import webview
 import threading
-from pystray import MenuItem as item
-import pystray
-from PIL import Image
 import os
 
 from api_server import app
-from app.core.notifier import run_notifier_check
+from app.services.local_ipc import local_ipc
 
 window = None
 
 def create_tray_icon():
+    # pystray and PIL are only needed once the tray icon is built, after the window is up.
+    from pystray import MenuItem as item
+    import pystray
+    from PIL import Image
+
     image_path = os.path.join(os.path.dirname(__file__), 'assets', 'icon.png')
     image = Image.open(image_path)
     menu = (item('Show Applications', show_window, default=True), item('exit', quit_window))
@@ -24,6 +26,8 @@ def show_window():
         window.show()
 
 def quit_window(icon):
+    # os._exit skips atexit handlers, so services that leave files behind stop here.
+    local_ipc.stop()
     if window:
         window.destroy()
     icon.stop()
@@ -34,7 +38,10 @@ def on_closing():
         window.hide()
     return False
 
-if __name__ == '__main__':
+def start_background_services():
+    # Runs on pywebview's worker thread once the GUI loop has started.
+    from app.core.notifier import run_notifier_check
+
     print("Starting background notifier thread...")
     notifier_thread = threading.Thread(target=run_notifier_check, daemon=True)
     notifier_thread.start()
@@ -43,14 +50,15 @@ if __name__ == '__main__':
     tray_thread.daemon = True
     tray_thread.start()
 
+if __name__ == '__main__':
     window = webview.create_window(
         'Note App',
         app,
-        width=1200,             
-        height=900,             
-        resizable=False         
+        width=1200,
+        height=900,
+        resizable=False
     )
 
     window.events.closing += on_closing
 
-    webview.start(debug=False)
\ No newline at end of file
+    webview.start(start_background_services, debug=False)
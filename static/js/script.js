@@ -13,12 +13,54 @@ applyTheme(savedTheme);
 const API_BASE_URL = 'http://127.0.0.1:5000';
 let calendar = null;
 let allTasks = []; // Global variable to store tasks
+let notesById = new Map();
+let notesRevision = 0; // Last server event revision applied to notesById
+
+const renderNotes = () => {
+    const notes = [...notesById.values()].sort((a, b) =>
+        a.deadline_timestamp - b.deadline_timestamp || String(a.id).localeCompare(String(b.id)));
+    allTasks = notes;
+    renderKanbanBoard(notes);
+    renderCalendar(notes);
+};
+
+const replaceNotes = (notes, revision) => {
+    notesById = new Map(notes.map(note => [note.id, note]));
+    notesRevision = revision;
+    renderNotes();
+};
+
+// Returns false when events were missed and the client must resync.
+const applyNoteEvent = (event) => {
+    if (event.revision <= notesRevision) return true;
+    if (event.revision !== notesRevision + 1) return false;
+    if (event.event === 'note_deleted') {
+        notesById.delete(event.id);
+    } else {
+        notesById.set(event.note.id, event.note);
+    }
+    notesRevision = event.revision;
+    return true;
+};
+
+const requestResync = () => socket.emit('resync', { since: notesRevision });
 
 const socket = io('http://127.0.0.1:5000');
-socket.on('notes_updated', (data) => {
-    renderKanbanBoard(data.notes);
-    renderCalendar(data.notes);
+['note_added', 'note_updated', 'note_deleted'].forEach(eventName => {
+    socket.on(eventName, (event) => {
+        if (applyNoteEvent(event)) {
+            renderNotes();
+        } else {
+            requestResync();
+        }
+    });
 });
+socket.on('notes_replay', (data) => {
+    data.events.forEach(applyNoteEvent);
+    renderNotes();
+});
+socket.on('notes_snapshot', (data) => replaceNotes(data.notes, data.revision));
+socket.on('connect', () => { if (notesRevision) requestResync(); });
 
 document.addEventListener('DOMContentLoaded', () => {
     const syncButton = document.getElementById('sync-button');
@@ -34,6 +76,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const saveSettingsButton = document.getElementById('save-settings-button');
     const tokenInput = document.getElementById('telegram-token');
     const idInput = document.getElementById('telegram-id');
+    const modeInput = document.getElementById('telegram-mode');
+    const webhookUrlInput = document.getElementById('telegram-webhook-url');
+    const realtimeSyncInput = document.getElementById('realtime-sync');
 
 
     const loadSettingsIntoForm = async () => {
@@ -42,6 +87,9 @@ document.addEventListener('DOMContentLoaded', () => {
             const settings = await response.json();
             tokenInput.value = settings.telegram_token || '';
             idInput.value = settings.telegram_id || '';
+            modeInput.value = settings.telegram_mode || 'polling';
+            webhookUrlInput.value = settings.telegram_webhook_url || '';
+            realtimeSyncInput.value = settings.realtime_sync ? 'on' : 'off';
 
         } catch (error) {
             console.error('Failed to load settings:', error);
@@ -57,7 +105,9 @@ document.addEventListener('DOMContentLoaded', () => {
         const newSettings = {
             telegram_token: tokenInput.value,
             telegram_id: idInput.value,
-
+            telegram_mode: modeInput.value,
+            telegram_webhook_url: webhookUrlInput.value,
+            realtime_sync: realtimeSyncInput.value === 'on',
         };
         try {
             const response = await fetch(`${API_BASE_URL}/api/settings`, {
@@ -66,8 +116,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: JSON.stringify(newSettings)
             });
             const result = await response.json();
-            alert(result.message);
-            closeSettings();
+            alert(result.message || `Error: ${result.error}`);
+            if (response.ok) closeSettings();
         } catch (error) {
             console.error('Failed to save settings:', error);
             alert('Failed to save settings.');
@@ -101,6 +151,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     settingsButton.addEventListener('click', () => themeMenu.classList.toggle('hidden'));
     themeOptions.forEach(option => { option.addEventListener('click', () => { const selectedTheme = option.dataset.theme; applyTheme(selectedTheme); localStorage.setItem('theme', selectedTheme); themeMenu.classList.add('hidden'); fetchAndDisplayNotes(); }); });
+    setupSearch();
     syncButton.addEventListener('click', async () => { await fetch(`${API_BASE_URL}/api/sync`, { method: 'POST' }); fetchAndDisplayNotes(); });
     cancelButton.addEventListener('click', closeModal);
 
@@ -108,6 +159,7 @@ document.addEventListener('DOMContentLoaded', () => {
         event.preventDefault();
         const formData = new FormData(addTaskForm);
         const taskData = Object.fromEntries(formData.entries());
+        taskData.id = newNoteId();
         try {
             const response = await fetch(`${API_BASE_URL}/api/notes`, {
                 method: 'POST',
@@ -118,8 +170,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 const errorData = await response.json();
                 throw new Error(errorData.error || 'Failed to add task');
             }
-            closeModal();
-            fetchAndDisplayNotes();
+            closeModal(); // The board updates from the note_added event
         } catch (error) {
             alert(`Error: ${error.message}`);
         }
@@ -165,15 +216,19 @@ document.addEventListener('DOMContentLoaded', () => {
     fetchAndDisplayNotes();
 });
 
+// Client-generated note ids make POST /api/notes safe to retry.
+function newNoteId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID().replace(/-/g, '');
+    return Date.now().toString(16) + Math.random().toString(16).slice(2, 14);
+}
+
 async function fetchAndDisplayNotes() {
     const kanbanBoard = document.getElementById('kanban-board');
     try {
-        const response = await fetch(`${API_BASE_URL}/api/notes`);
+        // no-cache makes the browser revalidate with If-None-Match; unchanged lists come back as 304.
+        const response = await fetch(`${API_BASE_URL}/api/notes`, { cache: 'no-cache' });
         const notes = await response.json();
-        allTasks = notes; // Store global
-
-        renderKanbanBoard(notes);
-        renderCalendar(notes);
+        replaceNotes(notes, Number(response.headers.get('X-Notes-Revision')) || 0);
 
     } catch (error) {
         console.error('Failed to fetch data from API:', error);
@@ -244,6 +299,8 @@ function renderCalendar(notes) {
     calendar.render();
 }
 
+// Superseded by the realtime_sync setting: the server keeps a Firestore listener open
+// and changes arrive over the Socket.IO note events.
 // setInterval(() => {
 //   fetch(`${API_BASE_URL}/api/sync`, { method: 'POST' }).then(() => {
 //     fetchAndDisplayNotes();
@@ -333,7 +390,6 @@ async function markNoteAsComplete(noteId) {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ status: 'completed' })
         });
-        fetchAndDisplayNotes();
     } catch (error) {
         console.error('Gagal update status:', error);
     }
@@ -343,7 +399,6 @@ async function deleteNote(noteId) {
     if (!confirm('Are you sure you want to delete this task?')) return;
     try {
         await fetch(`${API_BASE_URL}/api/notes/${noteId}`, { method: 'DELETE' });
-        fetchAndDisplayNotes();
     } catch (error) {
         console.error('Failed to delete note:', error);
     }
@@ -352,6 +407,7 @@ async function deleteNote(noteId) {
 // ==================== ASK AI PAGE FUNCTIONS ====================
 
 let currentTaskForAI = null;
+let currentChatSessionId = null; // created with the first message, so follow-ups keep their history
 
 function initAskAIPage() {
     const taskSelector = document.getElementById('task-selector');
@@ -475,27 +531,60 @@ async function sendAIMessage() {
     }
 
     try {
-        const response = await fetch(`${API_BASE_URL}/api/ask-ai`, {
+        if (!currentChatSessionId) {
+            const sessionResponse = await fetch(`${API_BASE_URL}/api/chat-sessions`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ title: prompt.slice(0, 50) })
+            });
+            if (sessionResponse.ok) currentChatSessionId = (await sessionResponse.json()).id;
+        }
+
+        const response = await fetch(`${API_BASE_URL}/api/ask-ai/stream`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 prompt: prompt,
-                context: context
+                context: context,
+                session_id: currentChatSessionId
             })
         });
 
-        const data = await response.json();
-
-        // Remove loading
-        const loadingEl = document.getElementById(loadingId);
-        if (loadingEl) loadingEl.remove();
-
-        if (response.ok) {
-            appendMessage(data.response, 'ai');
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
+            const loadingEl = document.getElementById(loadingId);
+            if (loadingEl) loadingEl.remove();
             appendMessage(`Error: ${data.error}`, 'ai');
+            return;
         }
 
+        // Tokens are rendered as they arrive; the loading bubble goes away with the first one.
+        let message = null;
+        const removeLoading = () => {
+            const loadingEl = document.getElementById(loadingId);
+            if (loadingEl) loadingEl.remove();
+        };
+        const ensureMessage = () => {
+            if (!message) {
+                removeLoading();
+                message = createStreamingMessage();
+            }
+            return message;
+        };
+
+        await readEventStream(response, (event, data) => {
+            if (event === 'token') {
+                ensureMessage().append(data.text);
+            } else if (event === 'done') {
+                ensureMessage().finish(data.response);
+            } else if (event === 'error') {
+                removeLoading();
+                if (message) message.finish();
+                appendMessage(`Error: ${data.error}`, 'ai');
+            }
+        });
+        removeLoading();
+
     } catch (error) {
         const loadingEl = document.getElementById(loadingId);
         if (loadingEl) loadingEl.remove();
@@ -504,6 +593,177 @@ async function sendAIMessage() {
     }
 }
 
+// Reads a text/event-stream response body and calls onEvent(event, data) per message.
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// An AI message bubble that grows as streamed text arrives. Markdown is re-rendered
+// at most once per animation frame; MathJax and the copy buttons run once at the end.
+function createStreamingMessage() {
+    const chatMessages = document.getElementById('chat-messages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message ai';
+
+    const avatar = document.createElement('div');
+    avatar.className = 'message-avatar ai-avatar-text';
+    avatar.textContent = 'KN';
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    messageDiv.appendChild(avatar);
+    messageDiv.appendChild(contentDiv);
+    chatMessages.appendChild(messageDiv);
+
+    const converter = new showdown.Converter();
+    let text = '';
+    let renderPending = false;
+
+    const render = () => {
+        renderPending = false;
+        contentDiv.innerHTML = converter.makeHtml(text.trim());
+        chatMessages.scrollTop = chatMessages.scrollHeight; // Auto scroll
+    };
+
+    return {
+        append(chunk) {
+            text += chunk;
+            if (!renderPending) {
+                renderPending = true;
+                requestAnimationFrame(render);
+            }
+        },
+        finish(fullText) {
+            if (fullText !== undefined) text = fullText;
+            render();
+            finalizeAIContent(contentDiv);
+        }
+    };
+}
+
+function finalizeAIContent(contentDiv) {
+    // Trigger MathJax to render equations
+    if (window.MathJax) {
+        MathJax.typesetPromise([contentDiv]).catch((err) => console.log('MathJax error:', err));
+    }
+
+    // ADD COPY BUTTONS TO CODE BLOCKS
+    const preBlocks = contentDiv.querySelectorAll('pre');
+    preBlocks.forEach(pre => {
+        const btn = document.createElement('button');
+        btn.className = 'copy-code-btn';
+        btn.textContent = 'Copy';
+        btn.title = 'Copy Code';
+
+        btn.addEventListener('click', () => {
+            const code = pre.querySelector('code') ? pre.querySelector('code').innerText : pre.innerText;
+            navigator.clipboard.writeText(code).then(() => {
+                btn.textContent = 'Copied!';
+                btn.classList.add('copied');
+                setTimeout(() => {
+                    btn.textContent = 'Copy';
+                    btn.classList.remove('copied');
+                }, 2000);
+            }).catch(err => console.error('Failed to copy:', err));
+        });
+
+        pre.appendChild(btn);
+    });
+}
+
+// ==================== SEARCH ====================
+
+function setupSearch() {
+    const input = document.getElementById('search-input');
+    const results = document.getElementById('search-results');
+    let timer = null;
+    let latestQuery = '';
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const query = input.value.trim();
+            latestQuery = query;
+            if (!query) {
+                results.classList.add('hidden');
+                return;
+            }
+            try {
+                const response = await fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&limit=8`);
+                const data = await response.json();
+                if (query === latestQuery) renderSearchResults(results, data); // drop stale responses
+            } catch (error) {
+                console.error('Search failed:', error);
+            }
+        }, 150);
+    });
+    input.addEventListener('keydown', (event) => {
+        if (event.key === 'Escape') results.classList.add('hidden');
+    });
+    document.addEventListener('click', (event) => {
+        if (!event.target.closest('.search-box')) results.classList.add('hidden');
+    });
+}
+
+// Snippets come from the server already HTML-escaped, with <mark> around matches.
+function renderSearchResults(container, data) {
+    container.innerHTML = '';
+    const addSection = (title, items, build) => {
+        if (!items || items.length === 0) return;
+        const heading = document.createElement('h4');
+        heading.textContent = title;
+        container.appendChild(heading);
+        items.forEach(item => container.appendChild(build(item)));
+    };
+    const buildResult = (titleText, snippetHtml, onClick) => {
+        const div = document.createElement('div');
+        div.className = 'search-result';
+        const title = document.createElement('div');
+        title.className = 'search-result-title';
+        title.textContent = titleText;
+        const snippet = document.createElement('div');
+        snippet.className = 'search-result-snippet';
+        snippet.innerHTML = snippetHtml;
+        div.appendChild(title);
+        div.appendChild(snippet);
+        if (onClick) div.addEventListener('click', onClick);
+        return div;
+    };
+
+    addSection('Notes', data.notes, note => buildResult(
+        `${note.mata_kuliah} · ${note.tanggal_deadline_str || ''}`, note.snippet,
+        () => { container.classList.add('hidden'); openViewNoteModal(note.id); }
+    ));
+    addSection('Chat history', data.messages, message => buildResult(
+        `${message.session_title || 'Chat'} · ${message.sender === 'ai' ? 'Kanee' : 'You'}`, message.snippet
+    ));
+    if (!container.hasChildNodes()) {
+        const empty = document.createElement('div');
+        empty.className = 'search-result';
+        empty.textContent = 'No results';
+        container.appendChild(empty);
+    }
+    container.classList.remove('hidden');
+}
+
 function appendMessage(text, sender, id = null) {
     const chatMessages = document.getElementById('chat-messages');
     const messageDiv = document.createElement('div');
@@ -541,57 +801,9 @@ function appendMessage(text, sender, id = null) {
         } else {
             // Convert Markdown to HTML
             // TRIM whitespace to prevent empty bottom space
-            const trimmedText = text.trim();
             const converter = new showdown.Converter();
-
-            // Typewriter logic
-            let i = 0;
-            const speed = 10; // ms per char (faster is better for long text)
-
-            contentDiv.innerHTML = ''; // Start empty
-            const chunkSize = 3; // chars per tick
-
-            function typeWriter() {
-                if (i < trimmedText.length) {
-                    i += chunkSize;
-                    const substring = trimmedText.substring(0, i);
-                    contentDiv.innerHTML = converter.makeHtml(substring);
-                    chatMessages.scrollTop = chatMessages.scrollHeight; // Auto scroll
-                    setTimeout(typeWriter, speed); // recurse
-                } else {
-                    // Final render to ensure everything is correct
-                    contentDiv.innerHTML = converter.makeHtml(trimmedText);
-
-                    // Trigger MathJax to render equations
-                    if (window.MathJax) {
-                        MathJax.typesetPromise([contentDiv]).catch((err) => console.log('MathJax error:', err));
-                    }
-
-                    // ADD COPY BUTTONS TO CODE BLOCKS
-                    const preBlocks = contentDiv.querySelectorAll('pre');
-                    preBlocks.forEach(pre => {
-                        const btn = document.createElement('button');
-                        btn.className = 'copy-code-btn';
-                        btn.textContent = 'Copy';
-                        btn.title = 'Copy Code';
-
-                        btn.addEventListener('click', () => {
-                            const code = pre.querySelector('code') ? pre.querySelector('code').innerText : pre.innerText;
-                            navigator.clipboard.writeText(code).then(() => {
-                                btn.textContent = 'Copied!';
-                                btn.classList.add('copied');
-                                setTimeout(() => {
-                                    btn.textContent = 'Copy';
-                                    btn.classList.remove('copied');
-                                }, 2000);
-                            }).catch(err => console.error('Failed to copy:', err));
-                        });
-
-                        pre.appendChild(btn);
-                    });
-                }
-            }
-            typeWriter();
+            contentDiv.innerHTML = converter.makeHtml(text.trim());
+            finalizeAIContent(contentDiv);
         }
     }
 
@@ -690,7 +902,6 @@ async function saveNoteChanges() {
 
         // Success
         closeEditNoteModal();
-        fetchAndDisplayNotes(); // Refresh UI
         alert("Tugas berhasil diupdate!");
 
     } catch (error) {
@@ -0,0 +1,28 @@
+# File: tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core import database
+
+@pytest.fixture
+def local_db(tmp_path, monkeypatch):
+    # A fresh, fully migrated database per test. The thread's pooled connection is
+    # released afterwards so the next test does not pick up this file.
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'notes.db'))
+    conn = database.get_db_connection()
+    yield conn
+    database.release_db_connection()
+
+@pytest.fixture
+def client(local_db, monkeypatch):
+    # The Flask app without its background services (outbox worker, IPC, webhook,
+    # realtime sync), with a configured Telegram user.
+    import api_server
+    monkeypatch.setattr(api_server.app, 'before_request_funcs', {})
+    monkeypatch.setattr(api_server, 'load_settings', lambda: {"telegram_id": "123456"})
+    return api_server.app.test_client()
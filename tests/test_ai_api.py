@@ -0,0 +1,27 @@
+# File: tests/test_ai_api.py
+
+import api_server
+from app.core import database
+
+def test_streamed_answer_releases_its_connection(client, monkeypatch):
+    session_id = database.create_chat_session("Integral")
+    monkeypatch.setattr(api_server.ai_service, 'get_cached', lambda messages, no_cache=False: "Cached answer")
+    response = client.post('/api/ask-ai/stream', json={"prompt": "Bantu integral", "session_id": session_id})
+    body = response.get_data(as_text=True)
+    assert "Cached answer" in body
+    # The generator saved the exchange after teardown and handed its connection back.
+    assert getattr(database._thread_state, 'conn', None) is None
+    assert [m["sender"] for m in database.get_chat_messages(session_id)] == ["user", "ai"]
+
+def test_cache_key_depends_on_session_history(local_db):
+    ai_service = api_server.ai_service
+    key = lambda session_id=None: ai_service.cache_key(
+        ai_service.build_messages("Contoh lain", "Kalkulus", session_id))
+    first, second, empty = (database.create_chat_session(title) for title in ("A", "B", "C"))
+    database.add_chat_messages(first, [("user", "Apa itu integral?"), ("ai", "Kebalikan turunan.")])
+    database.add_chat_messages(second, [("user", "Apa itu limit?"), ("ai", "Nilai yang didekati.")])
+    # The same follow-up after a different conversation is a different question.
+    assert key(first) != key(second)
+    assert key(first) != key()
+    # A session without history asks exactly what a sessionless request does.
+    assert key(empty) == key()
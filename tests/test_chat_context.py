@@ -0,0 +1,36 @@
+# File: tests/test_chat_context.py
+
+from app.core import chat_context, database
+
+def _long_session(turns):
+    session_id = database.create_chat_session("Tutoring")
+    database.add_chat_messages(session_id, [
+        (sender, f"Pesan {i}. " + "penjelasan " * 35)
+        for i in range(turns) for sender in ("user", "ai")
+    ])
+    return session_id
+
+def test_history_reads_only_the_window_and_unsummarized_messages(local_db, monkeypatch):
+    session_id = _long_session(250)
+    read = []
+    query = chat_context.query_chat_messages
+
+    def counted(*args, **kwargs):
+        rows = query(*args, **kwargs)
+        read.extend(rows)
+        return rows
+    monkeypatch.setattr(chat_context, 'query_chat_messages', counted)
+
+    summary, recent = chat_context.build_history(session_id)
+    assert summary and recent
+    assert recent[-1]['content'].startswith("Pesan 249.")
+    first_ask = len(read)
+
+    # The summary now covers everything before the window; the next turn reads about a
+    # page of messages, not the whole session again.
+    database.add_chat_messages(session_id, [("user", "Contoh lain?"), ("ai", "Tentu.")])
+    read.clear()
+    summary, recent = chat_context.build_history(session_id)
+    assert recent[-1]['content'] == "Tentu."
+    assert len(read) <= 2 * chat_context.HISTORY_PAGE_SIZE < first_ask
+    assert database.get_chat_summary(session_id)['upto_message_id'] < recent[0]['id']
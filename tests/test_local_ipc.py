@@ -0,0 +1,39 @@
+# File: tests/test_local_ipc.py
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.config import BOT_WORKER_THREADS
+from app.services import local_ipc as local_ipc_module
+from app.services.local_ipc import LocalIPC
+
+@pytest.fixture
+def server(tmp_path):
+    # The app's side of the channel; tests publish through a second LocalIPC reading the
+    # same info file, as the bot process does.
+    applied = []
+    ipc = LocalIPC(info_file=str(tmp_path / 'ipc.json'))
+    ipc.start(lambda notes: applied.extend(notes) or len(notes))
+    ipc.applied = applied
+    yield ipc
+    ipc.stop()
+    assert not (tmp_path / 'ipc.json').exists()
+
+def test_oversized_message_is_rejected_before_it_is_read_whole(server, monkeypatch):
+    monkeypatch.setattr(local_ipc_module, 'MAX_MESSAGE_BYTES', 64)
+    client = LocalIPC(info_file=server.info_file)
+    with client._connect(client._read_info(), 2) as sock:
+        sock.sendall(b'x' * 200)
+        with sock.makefile('rb') as reader:
+            assert json.loads(reader.readline()) == {"ok": False, "error": "message too large"}
+    assert server.applied == []
+
+def test_concurrent_publishes_from_the_bot_pool_all_arrive(server):
+    client = LocalIPC(info_file=server.info_file)
+    notes = [[(f"n{i}", {"status": "pending"})] for i in range(400)]
+    with ThreadPoolExecutor(BOT_WORKER_THREADS) as pool:
+        results = list(pool.map(client.publish_notes, notes))
+    assert all(results)
+    assert len(server.applied) == 400
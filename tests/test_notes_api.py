@@ -0,0 +1,51 @@
+# File: tests/test_notes_api.py
+
+NOTE = {"mata_kuliah": "Kalkulus", "deskripsi_tugas": "Latihan integral", "deadline": "2030-01-15 10:00"}
+
+def test_create_note_with_client_id(client):
+    response = client.post('/api/notes', json={**NOTE, "id": "note-1"})
+    assert response.status_code in (200, 201)
+    assert response.get_json()["id"] == "note-1"
+
+def test_create_note_rejects_non_string_id(client):
+    for note_id in (12345, ["a"], True):
+        response = client.post('/api/notes', json={**NOTE, "id": note_id})
+        assert response.status_code == 400, note_id
+        assert response.get_json()["error"] == "Invalid note id"
+
+def test_bulk_create_reports_invalid_items(client):
+    response = client.post('/api/notes/bulk', json={"notes": [{**NOTE, "id": 7}, "not a note", {**NOTE, "id": "ok-1"}]})
+    assert response.status_code == 200
+    results = {item["id"]: item for item in response.get_json()["results"]}
+    assert results["#0"]["error"] == "Invalid note id"
+    assert results["#1"]["result"] == "error"
+    assert results["ok-1"]["result"] == "created"
+
+def test_status_update_of_unknown_note_is_404(client):
+    from app.core import database
+    events = []
+    database.add_notes_listener(events.extend)
+    try:
+        response = client.patch('/api/notes/missing/status', json={"status": "done"})
+    finally:
+        database.remove_notes_listener(events.extend)
+    assert response.status_code == 404
+    assert events == []
+    assert database.get_outbox_stats()["depth"] == 0
+
+def test_write_in_the_same_second_is_not_hidden_by_if_modified_since(client):
+    from app.core import database
+    first = client.get('/api/notes')
+    database.create_local_note("same-second", {**NOTE, "deadline_timestamp": 1894600800, "status": "pending",
+                                               "user_id": 123456})
+    again = client.get('/api/notes', headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert again.status_code == 200
+    assert "same-second" in [note["id"] for note in again.get_json()]
+
+def test_unchanged_list_is_not_modified_since_its_date(client, monkeypatch):
+    import time
+    from app.core.events import note_events
+    monkeypatch.setattr(note_events, 'last_modified', time.time() - 10)
+    first = client.get('/api/notes')
+    again = client.get('/api/notes', headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert again.status_code == 304
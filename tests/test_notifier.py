@@ -0,0 +1,70 @@
+# File: tests/test_notifier.py
+
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import database, notifier
+from app.core.notifier import DeadlineScheduler
+
+NOW = 1767225600
+
+def _reminder(deadline_timestamp, offsets):
+    return {"id": "n1", "mata_kuliah": "Kalkulus", "deskripsi_tugas": "Latihan integral",
+            "tanggal_deadline_str": "01 January 2026 02:00", "deadline_iso_str": "2026-01-01",
+            "deadline_timestamp": deadline_timestamp, "offsets": offsets}
+
+def test_merged_reminder_states_the_real_time_left():
+    # The 1-day and 1-hour reminders merged after the app was closed; 90 minutes remain.
+    _, message = DeadlineScheduler(offsets=[86400, 3600])._format([_reminder(NOW + 5400, [86400, 3600])], NOW)
+    assert message.endswith("(in 1 hour(s) 30 minute(s))")
+
+def _note_data(deadline_timestamp):
+    return {"mata_kuliah": "Kalkulus", "deskripsi_tugas": "Latihan integral", "deadline_timestamp": deadline_timestamp,
+            "tanggal_deadline_str": "-", "deadline_iso_str": "-", "status": "pending"}
+
+@pytest.fixture
+def scheduler(local_db, monkeypatch):
+    # A scheduler fed by the notes listener, with every reminder query recorded.
+    scheduler = DeadlineScheduler(offsets=[3600], max_per_minute=0)
+    reads = []
+    def recorded(now_ts, note_ids=None):
+        reads.append(None if note_ids is None else set(note_ids))
+        return database.get_notes_for_reminders(now_ts, note_ids)
+    monkeypatch.setattr(notifier, 'get_notes_for_reminders', recorded)
+    scheduler.reads = reads
+    database.add_notes_listener(scheduler.notify_changed)
+    yield scheduler
+    database.remove_notes_listener(scheduler.notify_changed)
+
+def _step(scheduler):
+    # One pass of run(); only called with work pending, so it does not block.
+    rebuild, changed = scheduler._wait_for_work()
+    if rebuild:
+        scheduler._rebuild()
+    elif changed:
+        scheduler._update(changed)
+
+def test_changes_only_reread_the_changed_notes(scheduler):
+    now = time.time()
+    database.create_local_note("a", _note_data(now + 7200))
+    _step(scheduler)  # the initial full build
+    database.create_local_note("b", _note_data(now + 9000))
+    database.update_note_status("a", "done")
+    _step(scheduler)
+    assert scheduler.reads == [None, {"a", "b"}]
+    assert [entry[2]['id'] for entry in scheduler._heap] == ["b"]
+
+def test_own_dispatch_bookkeeping_does_not_reschedule(scheduler, monkeypatch):
+    shown = []
+    monkeypatch.setitem(sys.modules, 'plyer', SimpleNamespace(notification=SimpleNamespace(
+        notify=lambda **kwargs: shown.append(kwargs['title']))))
+    database.create_local_note("a", _note_data(time.time() + 60))  # its reminder is already due
+    _step(scheduler)
+    scheduler._dispatch(scheduler._pop_due())
+    assert shown == ["Deadline Reminder: Kalkulus"]
+    assert database.get_local_notes_by_ids(["a"])[0]["status"] == "notified"
+    assert not scheduler._dirty and not scheduler._changed_ids
+    assert scheduler.reads == [None]
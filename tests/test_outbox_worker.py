@@ -0,0 +1,47 @@
+# File: tests/test_outbox_worker.py
+
+from app.core import database
+from app.services.note_store import MemoryNoteStore
+from app.services.outbox_worker import OutboxWorker
+
+def _note(i):
+    return {"mata_kuliah": "Kalkulus", "deskripsi_tugas": f"Tugas {i}", "deadline_timestamp": 1767225600 + i,
+            "status": "pending", "user_id": 123456}
+
+def _make_due(conn):
+    with conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0")
+
+def test_failed_batch_backs_off_as_one_batch(local_db):
+    store = MemoryNoteStore(failure_rate=1.0)
+    worker = OutboxWorker(service=store)
+    database.bulk_create_local_notes([(f"n{i}", _note(i)) for i in range(200)])
+
+    worker.process_due()
+    assert store.calls == 1
+    retry_times = {row[0] for row in local_db.execute("SELECT DISTINCT next_attempt_at FROM outbox")}
+    assert len(retry_times) == 1
+    assert database.get_outbox_stats()["depth"] == 200
+
+    store.failure_rate = 0.0
+    _make_due(local_db)
+    worker.process_due()
+    assert store.calls == 2
+    assert database.get_outbox_stats()["depth"] == 0
+
+def test_missing_document_does_not_hold_back_the_batch(local_db):
+    store = MemoryNoteStore()
+    worker = OutboxWorker(service=store)
+    database.bulk_create_local_notes([(f"n{i}", _note(i)) for i in range(5)])
+    worker.process_due()
+    del store._documents["n2"]  # deleted remotely by another client
+
+    for i in range(5):
+        database.update_note_status(f"n{i}", "done")
+    calls = store.calls
+    worker.process_due()
+    # One batch naming the missing note, then one with the other four.
+    assert store.calls == calls + 2
+    assert database.get_outbox_stats()["depth"] == 0
+    assert [row["note_id"] for row in database.get_failed_outbox()] == ["n2"]
+    assert all(store._documents[f"n{i}"]["status"] == "done" for i in (0, 1, 3, 4))
@@ -0,0 +1,92 @@
+# File: tests/test_query_plans.py
+#
+# Runs the real query functions of the request, sync and notifier paths, captures the
+# SQL they execute (with parameters bound) and fails when any plan scans a table
+# without an index or sorts in a temporary B-tree.
+
+import time
+
+import pytest
+
+from app.core import chat_context, database
+
+NOW = 1767225600
+
+HOT_PATHS = {
+    "get_all_local_notes": lambda: database.get_all_local_notes(),
+    "query_local_notes": lambda: database.query_local_notes(limit=50),
+    "query_local_notes_after": lambda: database.query_local_notes(after=(NOW, 'n1'), limit=50),
+    "query_local_notes_status": lambda: database.query_local_notes(status=['pending'], limit=50),
+    "query_local_notes_status_after": lambda: database.query_local_notes(
+        status=['pending'], after=(NOW, 'n1'), limit=50),
+    "query_local_notes_statuses": lambda: database.query_local_notes(status=['pending', 'done'], limit=50),
+    "query_local_notes_course": lambda: database.query_local_notes(
+        mata_kuliah='Kalkulus', after=(NOW, 'n1'), limit=50),
+    "query_local_notes_deadline_range": lambda: database.query_local_notes(
+        deadline_from=NOW, deadline_to=NOW + 86400, limit=50),
+    "get_local_notes_by_ids": lambda: database.get_local_notes_by_ids(['n1', 'n2']),
+    "get_notes_for_reminders": lambda: database.get_notes_for_reminders(NOW),
+    "get_notes_for_reminders_ids": lambda: database.get_notes_for_reminders(NOW, ['n1', 'n2']),
+    "get_due_outbox": lambda: database.get_due_outbox(time.time()),
+    "get_outbox_entries_for_notes": lambda: database.get_outbox_entries_for_notes(['n1', 'n2']),
+    "get_next_outbox_attempt": lambda: database.get_next_outbox_attempt(),
+    "get_sync_watermark": lambda: database.get_sync_watermark('1'),
+    "get_cached_ai_response": lambda: database.get_cached_ai_response('k', time.time(), 3600),
+    "put_cached_ai_response": lambda: database.put_cached_ai_response('k', 'answer', time.time(), 1, 3600),
+    "get_chat_sessions": lambda: database.get_chat_sessions(),
+    "get_chat_messages": lambda: database.get_chat_messages(1),
+    "query_chat_messages": lambda: database.query_chat_messages(1, before=10, limit=50),
+    "query_chat_messages_since": lambda: database.query_chat_messages(1, since=3, limit=50),
+    "query_chat_messages_between": lambda: database.query_chat_messages(1, since=3, before=8, limit=50),
+    "build_history": lambda: chat_context.build_history(1, budget=200),
+    "get_chat_message": lambda: database.get_chat_message(1, 1),
+    "get_chat_summary": lambda: database.get_chat_summary(1),
+    "search_notes": lambda: database.search_notes('kalkulus'),
+    "search_chat_messages": lambda: database.search_chat_messages('integral'),
+}
+
+def _offending(plan):
+    # FTS5 tables report "SCAN <table> VIRTUAL TABLE INDEX ..." even for MATCH lookups,
+    # and ranking by bm25() has to sort the matches, so a search may use a temp B-tree.
+    full_text = any("VIRTUAL TABLE" in detail for detail in plan)
+    return [detail for detail in plan
+            if (detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail)
+            or ("TEMP B-TREE" in detail and not full_text)]
+
+def _seed():
+    # Plans are checked without ANALYZE statistics, as the app never gathers any.
+    database.bulk_create_local_notes([
+        (f"n{i}", {"mata_kuliah": "Kalkulus" if i % 2 else "Fisika", "deskripsi_tugas": f"Tugas {i}",
+                   "deadline_timestamp": NOW + i * 3600, "status": "pending" if i % 3 else "done"})
+        for i in range(20)
+    ])
+    session_id = database.create_chat_session("Integral")
+    database.add_chat_messages(session_id, [("user", "Bantu integral"), ("ai", "Tentu.")] * 5)
+
+def _captured_plans(conn, call):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    plans = {}
+    for sql in statements:
+        # Trigger bodies are traced as "-- TRIGGER ..."; writes without a WHERE have no plan worth checking.
+        if sql.lstrip().split(None, 1)[0].upper() not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            continue
+        plans[sql] = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    return plans
+
+@pytest.mark.parametrize("name", sorted(HOT_PATHS))
+def test_hot_query_uses_an_index(local_db, name):
+    _seed()
+    plans = _captured_plans(local_db, HOT_PATHS[name])
+    assert plans, f"{name} executed no query"
+    offenders = {sql: _offending(plan) for sql, plan in plans.items() if _offending(plan)}
+    assert not offenders, f"{name} has unindexed plans: {offenders}"
+
+def test_status_page_uses_status_index(local_db):
+    _seed()
+    plans = _captured_plans(local_db, HOT_PATHS["query_local_notes_status_after"])
+    assert any("idx_notes_status_deadline_id" in detail for plan in plans.values() for detail in plan)
@@ -0,0 +1,58 @@
+# File: tests/test_realtime_sync.py
+
+import time
+
+import pytest
+
+from app.core import database
+from app.services import realtime_sync as realtime_sync_module
+from app.services.note_store import MemoryNoteStore
+from app.services.realtime_sync import RealtimeSync
+
+USER_ID = "123456"
+
+def _note(title):
+    return {"mata_kuliah": title, "deskripsi_tugas": f"Tugas {title}", "deadline_timestamp": 1767225600,
+            "status": "pending", "user_id": int(USER_ID)}
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def _local_ids(note_ids):
+    return {row["id"] for row in database.get_local_notes_by_ids(note_ids)}
+
+@pytest.fixture
+def sync(local_db, monkeypatch):
+    monkeypatch.setattr(realtime_sync_module, 'REALTIME_CHECK_INTERVAL', 0.05)
+    monkeypatch.setattr(realtime_sync_module, 'REALTIME_BACKOFF_BASE', 0.05)
+    store = MemoryNoteStore()
+    sync = RealtimeSync(service=store)
+    sync._watching = True  # not registered with the global settings service
+    yield sync
+    sync.stop()
+    thread = sync._thread
+    if thread is not None:
+        thread.join(timeout=5)
+
+def test_reconnects_from_the_watermark(sync, local_db):
+    store = sync.service
+    store.apply_batch([('set', 'before', _note("Kalkulus"))])
+    sync.sync_with_settings({"realtime_sync": True, "telegram_id": USER_ID})
+    assert _wait_for(lambda: _local_ids(['before']) == {'before'})
+
+    # A write delivered on this thread is applied by the supervisor, which leaves this
+    # thread's connection alone.
+    store.apply_batch([('set', 'live', _note("Fisika"))])
+    assert database._thread_state.conn is local_db
+    assert _wait_for(lambda: _local_ids(['live']) == {'live'})
+
+    store.disconnect_watches()
+    store.apply_batch([('set', 'missed', _note("Kimia"))])  # no listener to deliver it
+    assert _wait_for(lambda: _local_ids(['missed']) == {'missed'})
+    assert sync.stats["connects"] == 2
+    assert sync.stats["failures"] == 1
@@ -0,0 +1,62 @@
+# File: tests/test_telegram_webhook.py
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import api_server
+from app.config import TELEGRAM_WEBHOOK_PATH
+from bot import webhook as webhook_module
+
+SECRET = "s3cret"
+
+@pytest.fixture
+def webhook(monkeypatch):
+    # A running TelegramWebhook whose Application is a bare update queue on its own
+    # event loop thread, so no bot token or network is needed.
+    hook = webhook_module.TelegramWebhook()
+    hook.secret = SECRET
+    hook._loop = asyncio.new_event_loop()
+    hook._application = SimpleNamespace(update_queue=asyncio.Queue(), bot=None)
+    thread = threading.Thread(target=hook._loop.run_forever, daemon=True)
+    thread.start()
+    hook._running.set()
+    monkeypatch.setattr(api_server, 'telegram_webhook', hook)
+    yield hook
+    hook._loop.call_soon_threadsafe(hook._loop.stop)
+    thread.join(timeout=5)
+
+def _queued(hook):
+    # Lets the loop run the enqueue coroutines scheduled so far.
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0), hook._loop).result(timeout=5)
+    return hook._application.update_queue.qsize()
+
+def _post(client, update, secret=SECRET):
+    return client.post(TELEGRAM_WEBHOOK_PATH, json=update,
+                       headers={'X-Telegram-Bot-Api-Secret-Token': secret})
+
+def test_update_is_queued(client, webhook):
+    assert _post(client, {"update_id": 1}).status_code == 200
+    assert _queued(webhook) == 1
+
+def test_wrong_secret_is_rejected(client, webhook):
+    assert _post(client, {"update_id": 1}, secret="wrong").status_code == 403
+    assert client.post(TELEGRAM_WEBHOOK_PATH, json={"update_id": 2}).status_code == 403
+    assert _queued(webhook) == 0
+
+def test_redelivered_update_is_dropped(client, webhook):
+    assert _post(client, {"update_id": 7}).status_code == 200
+    assert _post(client, {"update_id": 7}).status_code == 200
+    assert _queued(webhook) == 1
+
+def test_full_queue_answers_503(client, webhook, monkeypatch):
+    monkeypatch.setattr(webhook_module, 'TELEGRAM_WEBHOOK_QUEUE_SIZE', 1)
+    assert _post(client, {"update_id": 1}).status_code == 200
+    assert _queued(webhook) == 1
+    assert _post(client, {"update_id": 2}).status_code == 503
+    # Not remembered as seen, so Telegram's retry is accepted once there is room.
+    webhook._application.update_queue.get_nowait()
+    assert _post(client, {"update_id": 2}).status_code == 200
+    assert _queued(webhook) == 1